@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# ===============================================================
+# 🧪 Coste de arranque de la API por modo (VECTOR_ENGINE / LEXICAL_ENGINE)
+# Cada modo se mide en un proceso nuevo:
+#   import   tiempo de `import main` y RSS tras el import
+#   startup  warm-up de los componentes en proceso (corpus, modelo, índices locales) e import
+#            del cliente de Milvus si el modo lo usa; tiempo y RSS al terminar
+# y se anota si torch / sentence_transformers / pymilvus quedaron cargados.
+# Sale con código 1 si un modo solo léxico (VECTOR_ENGINE=none) importa la pila vectorial.
+# ===============================================================
+import json, os, subprocess, sys
+from pathlib import Path
+
+import pandas as pd
+
+BASE = Path(__file__).resolve().parents[1]
+API_DIR = BASE / "services" / "api"
+REPORTS_DIR = BASE / "reports"
+CORPUS_PATH = os.getenv("CORPUS_PATH", str(BASE / "data/corpus/books_preprocessed_MWE.jsonl"))
+WITH_STARTUP = os.getenv("BENCH_STARTUP", "1") == "1"  # 0 = medir solo el import
+
+# modo -> variables de entorno
+MODES = {
+    "solr_only": {"VECTOR_ENGINE": "none", "LEXICAL_ENGINE": "solr"},
+    "bm25_only": {"VECTOR_ENGINE": "none", "LEXICAL_ENGINE": "local"},
+    "solr_milvus": {"VECTOR_ENGINE": "milvus", "LEXICAL_ENGINE": "solr"},
+    "local_both": {"VECTOR_ENGINE": "local", "LEXICAL_ENGINE": "local"},
+}
+SELECTED = [m for m in os.getenv("BENCH_MODES", ",".join(MODES)).split(",") if m]
+HEAVY = ("torch", "sentence_transformers", "pymilvus")
+
+# Se ejecuta en el proceso hijo (cwd = services/api)
+CHILD = r"""
+import json, sys, time
+HEAVY = %r
+# Componentes de red: no se contactan, solo se importa su cliente
+REMOTE = {"solr": None, "milvus": "pymilvus"}
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def heavy():
+    return ",".join(m for m in HEAVY if m in sys.modules) or "-"
+
+
+out = {}
+t = time.perf_counter()
+import main
+out["import_s"] = time.perf_counter() - t
+out["import_rss_mb"] = rss_mb()
+out["import_heavy"] = heavy()
+if %r:
+    errors = []
+    t = time.perf_counter()
+    for name, c in main._readiness.components.items():
+        try:
+            if name in REMOTE:
+                if REMOTE[name]:
+                    __import__(REMOTE[name])
+            else:
+                c.warm()
+        except Exception as e:
+            errors.append(f"{name}: {e}"[:200])
+    out["startup_s"] = time.perf_counter() - t
+    out["startup_rss_mb"] = rss_mb()
+    out["startup_heavy"] = heavy()
+    out["errors"] = "; ".join(errors)
+print("@@" + json.dumps(out))
+"""
+
+
+def run_mode(name, env_vars):
+    env = {**os.environ, "CORPUS_PATH": CORPUS_PATH, **env_vars}
+    proc = subprocess.run([sys.executable, "-c", CHILD % (HEAVY, WITH_STARTUP)], cwd=API_DIR, env=env,
+                          capture_output=True, text=True)
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("@@")), None)
+    if line is None:
+        return {"mode": name, "errors": (proc.stderr.strip().splitlines() or ["sin salida"])[-1][:200]}
+    return {"mode": name, **json.loads(line[2:])}
+
+
+def main():
+    rows = []
+    for name in SELECTED:
+        print(f"⏳ {name} ({' '.join(f'{k}={v}' for k, v in MODES[name].items())})")
+        rows.append(run_mode(name, MODES[name]))
+    df = pd.DataFrame(rows).set_index("mode")
+    REPORTS_DIR.mkdir(exist_ok=True)
+    df.to_csv(REPORTS_DIR / "api_modes.csv")
+    print(df.round(3).to_string())
+    print(f"\n✅ Resultados en {REPORTS_DIR / 'api_modes.csv'}")
+
+    # Una instancia solo léxica no debe cargar torch ni pymilvus en ningún momento
+    bad = [m for m in df.index if MODES[m]["VECTOR_ENGINE"] == "none"
+           and any(str(df.loc[m].get(c, "-")) not in ("-", "nan") for c in ("import_heavy", "startup_heavy"))]
+    failed = [m for m in df.index if "import_s" not in df.columns or pd.isna(df.loc[m, "import_s"])]
+    if bad or failed:
+        print(f"❌ Pila vectorial importada en: {bad or '-'}; sin arrancar: {failed or '-'}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
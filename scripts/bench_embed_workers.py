@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# ===============================================================
+# ⚙️ Benchmark de encoding multi-proceso (escalado con nº de workers)
+# ===============================================================
+import os, sys, time
+from pathlib import Path
+
+import pandas as pd
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE / "services" / "indexer"))
+from corpus_store import get_corpus_store  # noqa: E402
+from encoder import Encoder  # noqa: E402
+
+CORPUS_PATH = Path(os.getenv("CORPUS_PATH", str(BASE / "data/corpus/books_preprocessed_MWE.jsonl")))
+REPORTS_DIR = BASE / "reports"
+MODEL_NAME = os.getenv("MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+N_DOCS = int(os.getenv("BENCH_DOCS", "1024"))
+WORKERS = [int(w) for w in os.getenv("BENCH_WORKERS", "1,2,4,8").split(",")]
+REPEATS = int(os.getenv("BENCH_REPEATS", "2"))
+
+
+def load_texts(n: int):
+    texts = []
+    for d in get_corpus_store(CORPUS_PATH).iter_docs():
+        texts.append(d.get("text_raw") or d.get("section_title") or "")
+        if len(texts) >= n:
+            break
+    return texts
+
+
+def main():
+    texts = load_texts(N_DOCS)
+    print(f"📄 {len(texts)} textos | CPUs: {os.cpu_count()} | workers: {WORKERS}")
+    rows = []
+    for w in WORKERS:
+        with Encoder(MODEL_NAME, workers=w) as enc:
+            enc.encode(texts[: 4 * max(1, enc.workers)])  # warm-up
+            best = float("inf")
+            for _ in range(REPEATS):
+                t = time.perf_counter()
+                enc.encode(texts)
+                best = min(best, time.perf_counter() - t)
+            rows.append({"workers": w, "effective_workers": enc.workers, "docs": len(texts),
+                         "seconds": round(best, 3), "docs_per_s": round(len(texts) / best, 1)})
+            print(f"🧵 {w} worker(s): {best:.2f}s → {len(texts) / best:.1f} docs/s")
+
+    df = pd.DataFrame(rows)
+    df["speedup"] = (df["docs_per_s"] / df["docs_per_s"].iloc[0]).round(2)
+    REPORTS_DIR.mkdir(exist_ok=True)
+    out = REPORTS_DIR / "bench_embed_workers.csv"
+    df.to_csv(out, index=False)
+    print(df.to_string(index=False))
+    print(f"\n✅ Resultados guardados en {out}")
+
+
+if __name__ == "__main__":
+    main()
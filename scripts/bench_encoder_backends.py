@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# ===============================================================
+# 🧪 Paridad y rendimiento de backends del encoder (torch / int8 / onnx / onnx-int8)
+# Paridad: coseno entre cada backend y torch fp32 sobre las queries gold.
+# Rendimiento: latencia de una query (p50/p95) y throughput en lote.
+# Sale con código 1 si algún backend queda por debajo de PARITY_MIN.
+# ===============================================================
+import json, os, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE / "services" / "api"))
+from corpus_store import get_corpus_store  # noqa: E402
+from model_backend import BACKENDS, load_sentence_model  # noqa: E402
+
+GOLD_PATH = BASE / "data/gold_weak.jsonl"
+SEED_PATH = BASE / "data/queries_seed.txt"
+CORPUS_PATH = Path(os.getenv("CORPUS_PATH", str(BASE / "data/corpus/books_preprocessed_MWE.jsonl")))
+REPORTS_DIR = BASE / "reports"
+MODEL_NAME = os.getenv("MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+CANDIDATES = [b for b in os.getenv("BENCH_BACKENDS", ",".join(BACKENDS)).split(",") if b]
+PARITY_MIN = float(os.getenv("PARITY_MIN", "0.98"))
+LAT_REPEATS = int(os.getenv("BENCH_LAT_REPEATS", "50"))
+N_DOCS = int(os.getenv("BENCH_DOCS", "256"))
+
+
+def load_queries():
+    qs = []
+    with open(GOLD_PATH, encoding="utf-8") as f:
+        qs += [json.loads(line)["query"] for line in f if line.strip()]
+    if SEED_PATH.exists():
+        qs += [l.strip() for l in SEED_PATH.read_text(encoding="utf-8").splitlines() if l.strip()]
+    return list(dict.fromkeys(qs))
+
+
+def load_docs(n: int):
+    if not CORPUS_PATH.exists():
+        return []
+    docs = []
+    for d in get_corpus_store(CORPUS_PATH).iter_docs():
+        docs.append(d.get("text_raw") or d.get("section_title") or "")
+        if len(docs) >= n:
+            break
+    return docs
+
+
+def encode(model, texts):
+    return np.asarray(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+def bench(model, queries, docs):
+    for q in queries[:3]:
+        encode(model, [q])  # warm-up
+    lat = []
+    for i in range(LAT_REPEATS):
+        q = queries[i % len(queries)]
+        t = time.perf_counter()
+        encode(model, [q])
+        lat.append((time.perf_counter() - t) * 1000)
+    batch = docs or queries * 8
+    t = time.perf_counter()
+    encode(model, batch)
+    thr = len(batch) / (time.perf_counter() - t)
+    return float(np.percentile(lat, 50)), float(np.percentile(lat, 95)), thr
+
+
+def main():
+    queries = load_queries()
+    docs = load_docs(N_DOCS)
+    print(f"🔍 {len(queries)} queries gold | {len(docs)} docs para throughput")
+
+    ref_model, _ = load_sentence_model(MODEL_NAME, "torch")
+    ref_q = encode(ref_model, queries)
+    ref_d = encode(ref_model, docs) if docs else None
+
+    rows, failed = [], []
+    for backend in CANDIDATES:
+        if backend == "torch":
+            model, effective = ref_model, "torch"
+        else:
+            try:
+                model, effective = load_sentence_model(MODEL_NAME, backend, fallback=False)
+            except Exception as e:
+                print(f"⚠️ {backend}: no disponible ({e})")
+                rows.append({"backend": backend, "available": False})
+                continue
+        cos_q = np.sum(encode(model, queries) * ref_q, axis=1)
+        cos_d = np.sum(encode(model, docs) * ref_d, axis=1) if docs else None
+        norms = np.linalg.norm(encode(model, queries[:5]), axis=1)
+        p50, p95, thr = bench(model, queries, docs)
+        ok = float(cos_q.min()) >= PARITY_MIN and bool(np.allclose(norms, 1.0, atol=1e-3))
+        if not ok:
+            failed.append(backend)
+        rows.append({
+            "backend": effective, "available": True, "parity_ok": ok,
+            "cos_min_queries": round(float(cos_q.min()), 5), "cos_mean_queries": round(float(cos_q.mean()), 5),
+            "cos_min_docs": round(float(cos_d.min()), 5) if cos_d is not None else None,
+            "lat_p50_ms": round(p50, 2), "lat_p95_ms": round(p95, 2), "docs_per_s": round(thr, 1),
+        })
+        print(f"{'✅' if ok else '❌'} {backend}: cos_min={cos_q.min():.4f} p50={p50:.1f}ms p95={p95:.1f}ms {thr:.0f} docs/s")
+
+    df = pd.DataFrame(rows)
+    REPORTS_DIR.mkdir(exist_ok=True)
+    out = REPORTS_DIR / "bench_encoder_backends.csv"
+    df.to_csv(out, index=False)
+    print(df.to_string(index=False))
+    print(f"\n📄 Resultados guardados en {out}")
+    if failed:
+        print(f"❌ Paridad por debajo de {PARITY_MIN}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# ===============================================================
+# 🧪 Concordancia del BM25 local (services/api/lexical_engine.py)
+#   0) configuración: similitud (k1, b) del managed-schema de rag_core frente a BM25_K1/BM25_B,
+#      y campos de SOLR_QF con el analizador que aproxima tokenize() (stopwords.txt vacío)
+#   1) contra la fórmula BM25 de Lucene + dismax calculada documento a documento, con SOLR_QF y
+#      la similitud del schema, sobre data/bm25_check_queries.txt + queries gold/seed
+#   2) contra Solr (edismax con el mismo qf) sobre las mismas consultas, si Solr responde
+#   3) contra data/corpus/rank_bm25_MWE_topN.csv (top-N de referencia por interview_id), solo si
+#      BM25_QUERIES_PATH trae el texto de las entrevistas (JSONL con interview_id y text o lemmas);
+#      ese CSV se generó con rank_bm25 (REF_QF / REF_K1), no con la configuración de Solr
+# Sale con código 1 si la configuración no cuadra o la concordancia media queda por debajo
+# de BM25_MIN_OVERLAP.
+# ===============================================================
+import json, math, os, sys, time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE / "services" / "api"))
+from lexical_engine import BM25_B, BM25_K1, BM25_TIE, BM25Index, parse_qf, tokenize  # noqa: E402
+
+CORPUS_PATH = Path(os.getenv("CORPUS_PATH", str(BASE / "data/corpus/books_preprocessed_MWE.jsonl")))
+REF_CSV = BASE / "data/corpus/rank_bm25_MWE_topN.csv"
+QUERIES_PATH = os.getenv("BM25_QUERIES_PATH", "")
+GOLD_PATH = BASE / "data/gold_weak.jsonl"
+SEED_PATH = BASE / "data/queries_seed.txt"
+CHECK_QUERIES_PATH = Path(os.getenv("BM25_CHECK_QUERIES", str(BASE / "data/bm25_check_queries.txt")))
+SOLR_CONF_DIR = Path(os.getenv("SOLR_CONF_DIR", str(BASE / "services/solr/data/data/rag_core/conf")))
+REPORTS_DIR = BASE / "reports"
+SOLR_BASE = os.getenv("SOLR_BASE", "http://localhost:8983/solr/rag_core")
+SOLR_QF = os.getenv("SOLR_QF", "text_raw lemmas section_title")
+# El CSV de referencia se generó con rank_bm25 (BM25Okapi, k1=1.5) sobre los lemas MWE;
+# no es la configuración de Solr, así que solo vale para ese CSV
+REF_QF = os.getenv("REF_QF", "lemmas")
+REF_K1 = float(os.getenv("REF_K1", "1.5"))
+K = int(os.getenv("EVAL_K", "5"))
+MIN_OVERLAP = float(os.getenv("BM25_MIN_OVERLAP", "0.6"))
+
+
+def overlap(a, b, k):
+    return len(set(a[:k]) & set(b[:k])) / max(1, min(k, len(b)))
+
+
+def check_queries():
+    qs = [json.loads(l)["query"] for l in open(GOLD_PATH, encoding="utf-8") if l.strip()]
+    for path in (SEED_PATH, CHECK_QUERIES_PATH):
+        if path.exists():
+            qs += [l.strip() for l in path.read_text(encoding="utf-8").splitlines() if l.strip()]
+    return list(dict.fromkeys(qs))
+
+
+def word_list(path):
+    """Entradas de un fichero de stopwords/sinónimos de Solr (sin comentarios ni líneas vacías)."""
+    if not path.exists():
+        return []
+    return [l.strip() for l in path.read_text(encoding="utf-8").splitlines()
+            if l.strip() and not l.lstrip().startswith("#")]
+
+
+def schema_config():
+    """(k1, b) de la similitud del schema y {campo: (tipo, stopwords, sinónimos de consulta)}."""
+    root = ET.parse(SOLR_CONF_DIR / "managed-schema.xml").getroot()
+    k1, b = 1.2, 0.75  # sin <similarity>: BM25Similarity con los valores por defecto de Lucene
+    sim = root.find("similarity")
+    if sim is not None:
+        if "BM25" not in sim.get("class", ""):
+            raise ValueError(f"similitud no BM25 en el schema: {sim.get('class')}")
+        params = {e.get("name"): float(e.text) for e in sim if e.get("name") in ("k1", "b")}
+        k1, b = params.get("k1", k1), params.get("b", b)
+    types = {t.get("name"): t for t in root.iter("fieldType")}
+    fields = {}
+    for f in root.iter("field"):
+        t = types.get(f.get("type"))
+        stop, syn = set(), 0
+        for an in (t.findall("analyzer") if t is not None else []):
+            for flt in an.findall("filter"):
+                if flt.get("name") == "stop":
+                    stop.update(word_list(SOLR_CONF_DIR / flt.get("words", "stopwords.txt")))
+                elif flt.get("name", "").startswith("synonym") and an.get("type") == "query":
+                    syn = len(word_list(SOLR_CONF_DIR / flt.get("synonyms", "synonyms.txt")))
+        fields[f.get("name")] = (f.get("type"), sorted(stop), syn)
+    return (k1, b), fields
+
+
+def check_config():
+    """Falla si el motor local no usa la similitud del schema o si algún campo de SOLR_QF no existe
+    o tiene stopwords (tokenize() no las quita)."""
+    (k1, b), fields = schema_config()
+    problems = []
+    print(f"⚙️ Schema: BM25 k1={k1} b={b}; local: BM25_K1={BM25_K1} BM25_B={BM25_B}; qf={SOLR_QF}")
+    if not (math.isclose(k1, BM25_K1) and math.isclose(b, BM25_B)):
+        problems.append(f"similitud local (k1={BM25_K1}, b={BM25_B}) distinta del schema (k1={k1}, b={b})")
+    for name in parse_qf(SOLR_QF):
+        if name not in fields:
+            problems.append(f"campo {name} de SOLR_QF no está en el schema")
+            continue
+        ftype, stop, syn = fields[name]
+        if stop:
+            problems.append(f"{name} ({ftype}) quita {len(stop)} stopwords y tokenize() no")
+        if syn:
+            print(f"ℹ️ {name} ({ftype}): {syn} reglas de sinónimos en consulta que el motor local no aplica")
+    if REF_QF != SOLR_QF or not math.isclose(REF_K1, k1):
+        print(f"ℹ️ El CSV de rank_bm25 usa qf={REF_QF} k1={REF_K1}, no la configuración de Solr")
+    for p in problems:
+        print(f"❌ {p}")
+    return problems, (k1, b)
+
+
+def lucene_scores(index, query, qf, k1, b, tie=BM25_TIE):
+    """BM25 de Lucene + dismax por término, documento a documento y sin arrays: referencia
+    independiente de los postings CSR de BM25Index."""
+    n = index.size
+    out = {}
+    per_field = {}
+    for name in qf:
+        f = index.fields[name]
+        docs_tf = [Counter() for _ in range(n)]
+        for term in set(tokenize(query)):
+            post = f.postings(term)
+            if post is not None:
+                for d, tf in zip(*post):
+                    docs_tf[int(d)][term] = float(tf)
+        per_field[name] = (f, docs_tf)
+    for term in tokenize(query):
+        for d in range(n):
+            contribs = []
+            for name, boost in qf.items():
+                f, docs_tf = per_field[name]
+                tf = docs_tf[d].get(term, 0.0)
+                if not tf:
+                    continue
+                df = len(f.postings(term)[0])
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                norm = k1 * (1 - b + b * float(f.doc_len[d]) / f.avgdl)
+                contribs.append(boost * idf * tf * (k1 + 1) / (tf + norm))
+            if contribs:
+                best = max(contribs)
+                out[d] = out.get(d, 0.0) + best + tie * (sum(contribs) - best)
+    return out
+
+
+def check_formula(qs, k1, b):
+    qf = parse_qf(SOLR_QF)
+    index = BM25Index.from_corpus(CORPUS_PATH, fields=qf, k1=k1, b=b)
+    pos = {sid: i for i, sid in enumerate(index.ids)}
+    rows = []
+    for q in qs:
+        ref = lucene_scores(index, q, qf, k1, b)
+        if not ref:
+            continue
+        got = [pos[sid] for sid, _ in index.search(q, K, qf)]
+        # Con empates en el corte cualquier doc con score >= el K-ésimo de la referencia vale
+        top = sorted(ref.values(), reverse=True)
+        kth, best = top[min(K, len(top)) - 1], top[0]
+        ok = [d for d in got if ref.get(d, 0.0) >= kth * (1 - 1e-5)]
+        rows.append({"check": "lucene_formula", "query": q, "overlap": len(ok) / min(K, len(top)),
+                     "top1": bool(got) and ref.get(got[0], 0.0) >= best * (1 - 1e-5)})
+    return rows
+
+
+def load_interviews(path):
+    out = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                d = json.loads(line)
+                text = d.get("text") or " ".join(d.get("lemmas", []))
+                out[str(d["interview_id"])] = text
+    return out
+
+
+def check_reference():
+    ref = pd.read_csv(REF_CSV).sort_values(["interview_id", "rank"])
+    if not QUERIES_PATH or not Path(QUERIES_PATH).exists():
+        print(f"ℹ️ {REF_CSV.name}: {ref['interview_id'].nunique()} consultas sin texto; "
+              f"define BM25_QUERIES_PATH para compararlas")
+        return []
+    queries = load_interviews(QUERIES_PATH)
+    index = BM25Index.from_corpus(CORPUS_PATH, fields=parse_qf(REF_QF), k1=REF_K1)
+    qf = parse_qf(REF_QF)
+    rows = []
+    for iid, grp in ref.groupby("interview_id"):
+        if iid not in queries:
+            continue
+        expected = grp["section_id"].astype(str).tolist()
+        got = [sid for sid, _ in index.search(queries[iid], len(expected), qf)]
+        rows.append({"check": "rank_bm25_csv", "query": iid, "overlap": overlap(got, expected, K),
+                     "top1": bool(got[:1] == expected[:1])})
+    return rows
+
+
+def solr_ids(q, k):
+    params = {"defType": "edismax", "q": q, "qf": SOLR_QF, "fl": "id", "rows": k, "wt": "json"}
+    r = requests.get(f"{SOLR_BASE}/select", params=params, timeout=10)
+    r.raise_for_status()
+    return [str(d["id"]) for d in r.json().get("response", {}).get("docs", [])]
+
+
+def check_solr(qs, k1, b):
+    try:
+        requests.get(f"{SOLR_BASE}/select", params={"q": "*:*", "rows": 0}, timeout=3).raise_for_status()
+    except Exception as e:
+        print(f"ℹ️ Solr no disponible en {SOLR_BASE} ({e}); se omite la comparación con Solr")
+        return []
+    qf = parse_qf(SOLR_QF)
+    t = time.perf_counter()
+    index = BM25Index.from_corpus(CORPUS_PATH, fields=qf, k1=k1, b=b)
+    print(f"📚 BM25 local: {index.size} docs en {time.perf_counter() - t:.2f}s")
+    rows = []
+    for q in qs:
+        t = time.perf_counter()
+        got = [sid for sid, _ in index.search(q, K, qf)]
+        local_ms = (time.perf_counter() - t) * 1000
+        t = time.perf_counter()
+        expected = solr_ids(q, K)
+        solr_ms = (time.perf_counter() - t) * 1000
+        rows.append({"check": "solr", "query": q, "overlap": overlap(got, expected, K),
+                     "top1": bool(got[:1] == expected[:1]),
+                     "local_ms": round(local_ms, 2), "solr_ms": round(solr_ms, 2)})
+    return rows
+
+
+def main():
+    problems, (k1, b) = check_config()
+    qs = check_queries()
+    rows = check_formula(qs, k1, b) + check_solr(qs, k1, b) + check_reference()
+    if not rows:
+        print("⚠️ No hubo nada que comparar")
+        sys.exit(1 if problems else 0)
+    df = pd.DataFrame(rows)
+    REPORTS_DIR.mkdir(exist_ok=True)
+    out = REPORTS_DIR / "check_bm25_local.csv"
+    df.to_csv(out, index=False)
+    summary = df.groupby("check").agg(queries=("query", "count"), overlap=("overlap", "mean"), top1=("top1", "mean"))
+    print(summary.round(3).to_string())
+    print(f"\n📄 Detalle guardado en {out}")
+    low = summary[summary["overlap"] < MIN_OVERLAP]
+    if not low.empty:
+        print(f"❌ Concordancia@{K} por debajo de {MIN_OVERLAP}: {', '.join(low.index)}")
+    if problems or not low.empty:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
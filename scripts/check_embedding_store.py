@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# ===============================================================
+# 🧪 Consistencia del almacén de embeddings (services/indexer/embedding_store.py)
+# Sobre un directorio temporal y un codificador determinista (sin modelo):
+#   1) encode_cached con textos repetidos en el mismo lote y entre lotes
+#   2) add_many con hashes repetidos
+#   3) reapertura del almacén (index.tsv + vectors.f32 tras flush)
+# y comprueba que cada texto recupera su propio vector. Sale con código 1 si alguno no cuadra.
+# ===============================================================
+import hashlib, sys, tempfile
+from pathlib import Path
+
+import numpy as np
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE / "services" / "indexer"))
+from embedding_store import EmbeddingStore, text_hash  # noqa: E402
+
+DIM = 8
+MODEL = "check/fake-model"
+
+
+def fake_vec(text):
+    seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+def fake_encode(texts):
+    return np.stack([fake_vec(t) for t in texts])
+
+
+def check(store, texts, label):
+    got = store.get_many([text_hash(t) for t in texts])
+    bad = [t for t, v in zip(texts, got) if v is None or not np.allclose(v, fake_vec(t))]
+    rows = store.vec_path.stat().st_size // (4 * DIM)
+    ok = not bad and rows == store.count == len(set(store.index.values()))
+    print(f"{'✅' if ok else '❌'} {label}: {store.count} hashes, {rows} filas"
+          + (f", vectores erróneos: {bad}" if bad else ""))
+    return ok
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore(MODEL, DIM, Path(root))
+        results = []
+        batch = ["a", "a", "bbb", "cc", "bbb"]
+        out = store.encode_cached(batch, fake_encode)
+        results.append(all(np.allclose(v, fake_vec(t)) for t, v in zip(batch, out)))
+        results.append(check(store, batch, "encode_cached con duplicados"))
+        store.encode_cached(["cc", "dddd", "dddd", "a", "e"], fake_encode)
+        results.append(check(store, ["a", "bbb", "cc", "dddd", "e"], "segundo lote con ya vistos"))
+        store.add_many([text_hash(t) for t in ["f", "f", "g"]], fake_encode(["f", "f", "g"]))
+        results.append(check(store, ["a", "bbb", "cc", "dddd", "e", "f", "g"], "add_many con duplicados"))
+        store.flush()
+        reopened = EmbeddingStore(MODEL, DIM, Path(root))
+        results.append(check(reopened, ["a", "bbb", "cc", "dddd", "e", "f", "g"], "reapertura"))
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# ===============================================================
+# 🧪 Módulos duplicados entre services/api y services/indexer
+# Cada servicio se construye con su propio contexto de Docker, así que los módulos comunes
+# viven copiados en ambos. Este script compara las copias (salvo la línea 1, la cabecera con
+# la ruta del fichero) y sale con código 1 si alguna ha divergido, mostrando el diff.
+# Tras editar uno de ellos: cp services/api/<módulo> services/indexer/ y restaurar la cabecera.
+# ===============================================================
+import difflib, sys
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+SOURCE_DIR = BASE / "services" / "api"     # copia de referencia
+COPY_DIR = BASE / "services" / "indexer"
+SHARED = ("corpus_store.py", "model_backend.py")
+
+
+def body(path: Path):
+    return path.read_text(encoding="utf-8").splitlines(keepends=True)[1:]
+
+
+def main():
+    bad = []
+    for name in SHARED:
+        src, dst = SOURCE_DIR / name, COPY_DIR / name
+        missing = [str(p.relative_to(BASE)) for p in (src, dst) if not p.exists()]
+        if missing:
+            print(f"❌ {name}: falta {', '.join(missing)}")
+            bad.append(name)
+            continue
+        diff = list(difflib.unified_diff(body(src), body(dst), str(src.relative_to(BASE)),
+                                         str(dst.relative_to(BASE))))
+        if diff:
+            print(f"❌ {name}: las copias difieren")
+            sys.stdout.writelines(diff)
+            bad.append(name)
+        else:
+            print(f"✅ {name}: idéntico")
+    if bad:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# ===============================================================
+# 📊 Evaluación unificada: Recall@k, MRR, nDCG@k, ROUGE-L y latencia por motor
+# Cada consulta gold se lanza una sola vez por motor (pool de EVAL_WORKERS hilos) y la
+# respuesta se guarda en disco (EVAL_CACHE_DIR); las métricas salen de ese único conjunto.
+# La clave de caché incluye la configuración de la API (GET /config: motores, fusión, modelo y
+# generación del índice), así que tras reindexar o cambiar de motor se vuelve a consultar.
+# Las latencias solo cuentan respuestas no cacheadas y se miden con EVAL_WORKERS peticiones
+# concurrentes: no son comparables con las de los antiguos scripts secuenciales.
+# Por defecto ROUGE-L sigue a los scripts antiguos: su propia petición con top_k=EVAL_ROUGE_K (3)
+# y el texto que usaba cada uno (Solr: section_title + text_raw; Milvus: text_raw); con
+# EVAL_ROUGE_FIELDS se fijan los mismos campos para todos los motores.
+# Sustituye a eval_metrics.py, eval_milvus_recall.py, eval_solr_recall.py, eval_rougeL.py
+# y eval_solr_rougeL.py (escribe también sus CSV para scripts/exploracion_metricas.ipynb).
+# ===============================================================
+import hashlib, json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+from rouge_score import rouge_scorer
+from tqdm import tqdm
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE / "services" / "api"))
+from corpus_store import get_corpus_store  # noqa: E402
+
+API_BASE = os.getenv("RAG_API_BASE", "http://localhost:8000")
+GOLD_PATH = Path(os.getenv("GOLD_PATH", str(BASE / "data/gold_weak.jsonl")))
+INDEX_GEN_PATH = Path(os.getenv("INDEX_GEN_PATH", str(BASE / "data/index_generation.json")))
+CONFIG_TAG = os.getenv("EVAL_CONFIG_TAG", "")  # etiqueta libre para separar cachés a mano
+CORPUS_PATH = Path(os.getenv("CORPUS_PATH", str(BASE / "data/corpus/books_preprocessed_MWE.jsonl")))
+REPORTS_DIR = BASE / "reports"
+CACHE_DIR = Path(os.getenv("EVAL_CACHE_DIR", str(REPORTS_DIR / "eval_cache")))
+ENGINES = [e for e in os.getenv("EVAL_ENGINES", "solr,milvus,both").split(",") if e]
+K = int(os.getenv("EVAL_K", "5"))
+ROUGE_K = int(os.getenv("EVAL_ROUGE_K", "3"))  # top_k de la petición de ROUGE-L (documentos concatenados)
+# "baseline" = campos de los antiguos eval_rougeL.py / eval_solr_rougeL.py; si no, lista de campos
+ROUGE_FIELDS = os.getenv("EVAL_ROUGE_FIELDS", "baseline")
+WORKERS = int(os.getenv("EVAL_WORKERS", "8"))
+REFRESH = os.getenv("EVAL_REFRESH", "0") == "1"  # 1 = ignorar la caché y volver a consultar
+TIMEOUT_S = float(os.getenv("EVAL_TIMEOUT_S", "30"))
+
+# motor -> (endpoint, campos extra del cuerpo)
+ENDPOINTS = {
+    "solr": ("/query_solr", {}),
+    "milvus": ("/query_milvus", {}),
+    "both": ("/ask", {"backend": "both"}),
+}
+
+
+# --- Métricas ---
+def recall_at_k(relevant, retrieved, k):
+    return len(set(relevant) & set(retrieved[:k])) / max(1, len(relevant))
+
+
+def mrr(relevant, retrieved):
+    for rank, doc in enumerate(retrieved, 1):
+        if doc in relevant:
+            return 1 / rank
+    return 0.0
+
+
+def ndcg_at_k(relevant, retrieved, k):
+    dcg = sum(1 / np.log2(i + 2) for i, doc in enumerate(retrieved[:k]) if doc in relevant)
+    ideal = sum(1 / np.log2(i + 2) for i in range(min(len(relevant), k)))
+    return dcg / ideal if ideal > 0 else 0.0
+
+
+def rouge_fields(engine):
+    if ROUGE_FIELDS != "baseline":
+        return [f.strip() for f in ROUGE_FIELDS.split(",") if f.strip()]
+    return ["section_title", "text_raw"] if engine == "solr" else ["text_raw"]
+
+
+def doc_text(corpus, doc, fields):
+    """Campos del documento (del corpus; de la respuesta de la API si no hay corpus) unidos por espacios."""
+    src = (corpus.get(str(doc.get("id"))) if corpus is not None else None) or doc
+    parts = []
+    for f in fields:
+        v = src.get(f) or ""
+        parts.append(" ".join(map(str, v)) if isinstance(v, list) else str(v))
+    return " ".join(p for p in parts if p).strip()
+
+
+# --- Consultas con caché en disco ---
+def server_config(session):
+    """Configuración efectiva de la API; si no expone /config, se usa la generación del índice local."""
+    try:
+        r = session.get(f"{API_BASE}/config", timeout=TIMEOUT_S)
+        r.raise_for_status()
+        return r.json()
+    except Exception as e:
+        print(f"⚠️ GET /config falló ({e}); la caché solo distingue la generación de {INDEX_GEN_PATH}")
+        try:
+            return {"index_generation": json.loads(INDEX_GEN_PATH.read_text(encoding="utf-8"))}
+        except (OSError, ValueError):
+            return {"index_generation": None}
+
+
+def cache_path(engine, query, top_k, config):
+    key = json.dumps([API_BASE, engine, query, top_k, config, CONFIG_TAG], ensure_ascii=False, sort_keys=True)
+    return CACHE_DIR / f"{engine}_{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+
+def fetch(session, engine, query, top_k, config):
+    path = cache_path(engine, query, top_k, config)
+    if not REFRESH and path.exists():
+        data = json.loads(path.read_text(encoding="utf-8"))
+        data["cached"] = True
+        return data
+    endpoint, extra = ENDPOINTS[engine]
+    start = time.perf_counter()
+    try:
+        r = session.post(f"{API_BASE}{endpoint}", json={"query": query, "top_k": top_k, **extra}, timeout=TIMEOUT_S)
+        r.raise_for_status()
+        data = {"results": r.json().get("results", []), "error": None}
+    except Exception as e:
+        data = {"results": [], "error": str(e)[:300]}
+    data["latency_s"] = time.perf_counter() - start
+    if data["error"] is None:
+        # Solo se cachean respuestas correctas; los errores se reintentan en la próxima ejecución
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    data["cached"] = False
+    return data
+
+
+def write_legacy_reports(ok):
+    """CSV con el formato de los antiguos eval_*.py, que lee scripts/exploracion_metricas.ipynb.
+    Los de ROUGE-L llevan la latencia de su propia petición (top_k=EVAL_ROUGE_K), como antes.
+    Las filas cacheadas quedan sin latencia."""
+    ok = ok.assign(latency_s=ok["latency_s"].where(~ok["cached"]),
+                   rouge_latency_s=ok["rouge_latency_s"].where(~ok["rouge_cached"]))
+    solr, milvus = ok[ok["engine"] == "solr"], ok[ok["engine"] == "milvus"]
+    rouge_cols = {"rouge_latency_s": "latency_s"}
+    outputs = {
+        "metrics_milvus.csv": milvus[["query", f"recall@{K}", "mrr", f"ndcg@{K}", "latency_s"]]
+        .rename(columns={f"ndcg@{K}": "ndcg"}),
+        "metrics_solr_recall.csv": solr[["query", "hits", "gt_docs", f"recall@{K}", "latency_s"]],
+        "metrics_rougeL.csv": milvus[["query", "rougeL_f", "rouge_latency_s"]].rename(columns=rouge_cols),
+        "metrics_solr_rougeL.csv": solr[["query", "rougeL_f", "rouge_latency_s", "has_text"]].rename(columns=rouge_cols),
+    }
+    for name, frame in outputs.items():
+        if len(frame):
+            frame.to_csv(REPORTS_DIR / name, index=False)
+
+
+def main():
+    with open(GOLD_PATH, encoding="utf-8") as f:
+        gold = [json.loads(line) for line in f if line.strip()]
+    # Solo se leen del corpus los textos de los ids relevantes y recuperados
+    corpus = get_corpus_store(CORPUS_PATH) if CORPUS_PATH.exists() else None
+    if corpus is None:
+        print(f"⚠️ Corpus no encontrado en {CORPUS_PATH}: ROUGE-L usará solo el texto devuelto por la API")
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with requests.Session() as s:
+        config = server_config(s)
+
+    # Una petición por (consulta, motor, top_k), todas en paralelo con sesiones por hilo; la de
+    # ROUGE-L va aparte (como en los scripts antiguos) salvo que EVAL_ROUGE_K == EVAL_K
+    depths = list(dict.fromkeys([K, ROUGE_K]))
+    jobs = [(entry, engine, k) for entry in gold for engine in ENGINES for k in depths]
+    local = threading.local()
+
+    def run(job):
+        entry, engine, k = job
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return fetch(local.session, engine, entry["query"], k, config)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        responses = list(tqdm(pool.map(run, jobs), total=len(jobs), desc="Consultando API"))
+    print(f"⏱️ {len(jobs)} consultas en {time.perf_counter() - t0:.1f}s "
+          f"({sum(r['cached'] for r in responses)} desde caché)")
+    by_job = {(entry["query"], engine, k): resp for (entry, engine, k), resp in zip(jobs, responses)}
+
+    scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+    text = corpus.text if corpus is not None else (lambda sid: "")
+    rows = []
+    for entry in gold:
+        relevant = [str(d) for d in entry.get("relevant_doc_ids", [])]
+        ref_text = " ".join(text(i) for i in relevant)
+        for engine in ENGINES:
+            resp = by_job[(entry["query"], engine, K)]
+            rouge_resp = by_job[(entry["query"], engine, ROUGE_K)]
+            retrieved = [str(d.get("id")) for d in resp["results"]]
+            fields = rouge_fields(engine)
+            hyp_text = " ".join(t for t in (doc_text(corpus, d, fields) for d in rouge_resp["results"][:ROUGE_K]) if t)
+            rouge = scorer.score(ref_text, hyp_text)["rougeL"].fmeasure if ref_text.strip() and hyp_text.strip() else 0.0
+            rows.append({
+                "engine": engine,
+                "query": entry["query"],
+                f"recall@{K}": recall_at_k(relevant, retrieved, K),
+                "mrr": mrr(relevant, retrieved[:K]),
+                f"ndcg@{K}": ndcg_at_k(relevant, retrieved, K),
+                "rougeL_f": rouge,
+                "hits": len(set(relevant) & set(retrieved[:K])),
+                "gt_docs": len(relevant),
+                "has_text": bool(hyp_text),
+                "latency_s": resp["latency_s"],
+                "cached": resp["cached"],
+                "rouge_latency_s": rouge_resp["latency_s"],
+                "rouge_cached": rouge_resp["cached"],
+                "error": resp["error"] or rouge_resp["error"],
+            })
+
+    df = pd.DataFrame(rows)
+    REPORTS_DIR.mkdir(exist_ok=True)
+    df.to_csv(REPORTS_DIR / "eval_results.csv", index=False)
+    ok = df[df["error"].isna()]
+    summary = ok.groupby("engine", sort=False).agg(**{
+        "queries": ("query", "count"),
+        f"recall@{K}": (f"recall@{K}", "mean"),
+        "mrr": ("mrr", "mean"),
+        f"ndcg@{K}": (f"ndcg@{K}", "mean"),
+        "rougeL_f": ("rougeL_f", "mean"),
+    })
+    # Latencia solo de respuestas nuevas: las cacheadas traen la de una ejecución anterior
+    fresh = ok[~ok["cached"]]
+    lat = fresh.groupby("engine")["latency_s"]
+    summary["fresh_queries"] = lat.count().reindex(summary.index, fill_value=0)
+    summary["latency_p50_s"] = lat.median().reindex(summary.index)
+    summary["latency_p95_s"] = lat.quantile(0.95).reindex(summary.index)
+    summary["latency_concurrency"] = WORKERS
+    summary["errors"] = df[df["error"].notna()].groupby("engine").size().reindex(summary.index, fill_value=0)
+    summary.to_csv(REPORTS_DIR / "eval_summary.csv")
+    write_legacy_reports(ok)
+    print(summary.round(4).to_string())
+    print(f"\nℹ️ Latencias de {len(fresh)} respuestas no cacheadas, medidas con {WORKERS} peticiones "
+          f"concurrentes (no comparables con mediciones secuenciales)")
+    print(f"ℹ️ ROUGE-L sobre top_k={ROUGE_K}, campos: "
+          + "; ".join(f"{e}={'+'.join(rouge_fields(e))}" for e in ENGINES))
+    print(f"✅ Resultados en {REPORTS_DIR / 'eval_results.csv'} y {REPORTS_DIR / 'eval_summary.csv'}")
+
+
+if __name__ == "__main__":
+    main()
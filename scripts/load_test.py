@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# ===============================================================
+# 🚦 Prueba de carga de la API: throughput y latencia p50/p95/p99 por endpoint
+#   Fuente de consultas (LOAD_SOURCE): seed | gold | ruta a un log (JSONL con query/title o texto plano)
+#   LOAD_CONCURRENCY hilos; LOAD_RATE peticiones/s en lazo abierto (0 = lazo cerrado, sin pausa)
+#   LOAD_INPROCESS=1 levanta la API en proceso con los motores locales (sin Solr ni Milvus)
+# Resultados: reports/load_test_<etiqueta>.csv (por petición) y .json (resumen)
+# ===============================================================
+import json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+
+BASE = Path(__file__).resolve().parents[1]
+API_BASE = os.getenv("RAG_API_BASE", "http://localhost:8000")
+SOURCE = os.getenv("LOAD_SOURCE", "seed")
+ENDPOINTS = [e for e in os.getenv("LOAD_ENDPOINTS", "query_solr,query_milvus,ask").split(",") if e]
+CONCURRENCY = int(os.getenv("LOAD_CONCURRENCY", "8"))
+RATE = float(os.getenv("LOAD_RATE", "0"))
+REQUESTS_PER_ENDPOINT = int(os.getenv("LOAD_REQUESTS", "200"))
+TOP_K = int(os.getenv("LOAD_TOP_K", "5"))
+ASK_BACKEND = os.getenv("LOAD_ASK_BACKEND", "both")
+WARMUP = int(os.getenv("LOAD_WARMUP", "5"))
+TIMEOUT_S = float(os.getenv("LOAD_TIMEOUT_S", "30"))
+INPROCESS = os.getenv("LOAD_INPROCESS", "0") == "1"
+READY_TIMEOUT_S = float(os.getenv("LOAD_READY_TIMEOUT_S", "600"))  # en proceso: carga de modelo e índices
+LABEL = os.getenv("LOAD_LABEL", time.strftime("%Y%m%d_%H%M%S"))
+REPORTS_DIR = BASE / "reports"
+
+
+# === Consultas ===
+def load_queries(source: str):
+    if source == "seed":
+        path = BASE / "data/queries_seed.txt"
+        return [l.strip() for l in path.read_text(encoding="utf-8").splitlines() if l.strip()]
+    path = BASE / "data/gold_weak.jsonl" if source == "gold" else Path(source)
+    qs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                d = json.loads(line)
+            except ValueError:
+                qs.append(line)
+                continue
+            q = d.get("query") or d.get("q") or d.get("title") if isinstance(d, dict) else None
+            if q:
+                qs.append(str(q))
+    return qs
+
+
+# === Clientes ===
+def http_client():
+    local = threading.local()
+
+    def post(path, body):
+        s = getattr(local, "session", None)
+        if s is None:
+            s = local.session = requests.Session()
+        r = s.post(f"{API_BASE}{path}", json=body, timeout=TIMEOUT_S)
+        return r.status_code
+    return post
+
+
+def inprocess_client():
+    # Motores en proceso: BM25 local y vectorial exacto, sin servicios externos
+    os.environ.setdefault("LEXICAL_ENGINE", "local")
+    os.environ.setdefault("VECTOR_ENGINE", "local")
+    os.environ.setdefault("VECTOR_LOCAL_ENCODE", "1")
+    os.environ.setdefault("CORPUS_PATH", str(BASE / "data/corpus/books_preprocessed_MWE.jsonl"))
+    os.environ.setdefault("EMBED_STORE_DIR", str(BASE / "data/embeddings"))
+    os.environ.setdefault("INDEX_GEN_PATH", str(BASE / "data/index_generation.json"))
+    # Necesita el corpus real y, con rama vectorial, sentence-transformers y el modelo
+    corpus = Path(os.environ["CORPUS_PATH"])
+    if not corpus.exists():
+        raise SystemExit(f"❌ LOAD_INPROCESS=1 necesita el corpus en {corpus} (define CORPUS_PATH)")
+    if os.environ["VECTOR_ENGINE"] != "none":
+        try:
+            import sentence_transformers  # noqa: F401
+        except ImportError:
+            raise SystemExit("❌ LOAD_INPROCESS=1 con rama vectorial necesita sentence-transformers "
+                             "(o VECTOR_ENGINE=none para medir solo la rama léxica)")
+    sys.path.insert(0, str(BASE / "services" / "api"))
+    from fastapi.testclient import TestClient
+    import main
+    client = TestClient(main.app)
+    client.__enter__()  # ejecuta los eventos de arranque (carga de índices)
+    print(f"⏳ Esperando a que la API en proceso esté lista (hasta {READY_TIMEOUT_S:.0f}s)…")
+    if not main._readiness.wait(READY_TIMEOUT_S):
+        failed = {n: c["error"] or c["state"] for n, c in main._readiness.status()["components"].items()
+                  if c["required"] and not c["ready"]}
+        raise SystemExit(f"❌ La API en proceso no arrancó: {failed}")
+
+    def post(path, body):
+        return client.post(path, json=body).status_code
+    return post
+
+
+def body_for(endpoint: str, q: str):
+    body = {"query": q, "top_k": TOP_K}
+    if endpoint == "ask":
+        body["backend"] = ASK_BACKEND
+    return body
+
+
+# === Ejecución ===
+def run_endpoint(post, endpoint: str, queries):
+    for q in queries[:WARMUP]:
+        try:
+            post(f"/{endpoint}", body_for(endpoint, q))
+        except Exception:
+            pass
+
+    n = REQUESTS_PER_ENDPOINT
+    t0 = time.perf_counter()  # solo fija el horario del lazo abierto
+    rows = [None] * n
+
+    def one(i):
+        q = queries[i % len(queries)]
+        scheduled = t0 + i / RATE if RATE > 0 else None
+        if scheduled is not None:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        start = time.perf_counter()
+        try:
+            status, error = post(f"/{endpoint}", body_for(endpoint, q)), ""
+        except Exception as e:
+            status, error = 0, str(e)[:200]
+        end = time.perf_counter()
+        rows[i] = {
+            "endpoint": endpoint, "i": i, "query": q, "status": status, "error": error,
+            "latency_ms": (end - start) * 1000,
+            # En lazo abierto el retraso respecto al horario cuenta como latencia percibida
+            "queue_ms": (start - scheduled) * 1000 if scheduled is not None else 0.0,
+            "t_start_s": start, "t_end_s": end,
+        }
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        list(pool.map(one, range(n)))
+    # El reloj empieza con la primera petición enviada, no al crear el pool
+    first = min(r["t_start_s"] for r in rows)
+    for r in rows:
+        r["t_start_s"] -= first
+        r["t_end_s"] -= first
+    return rows
+
+
+def summarize(df: pd.DataFrame):
+    out = []
+    for endpoint, g in df.groupby("endpoint", sort=False):
+        ok = g[g["status"] == 200]
+        lat = ok["latency_ms"].to_numpy()
+        total = (ok["latency_ms"] + ok["queue_ms"]).to_numpy()
+        wall = g["t_end_s"].max() if len(g) else 0.0
+        p = (lambda a, q: round(float(np.percentile(a, q)), 2) if len(a) else None)
+        out.append({
+            "endpoint": endpoint, "requests": len(g), "ok": len(ok), "errors": int(len(g) - len(ok)),
+            "throughput_rps": round(len(ok) / wall, 2) if wall > 0 else None,
+            "p50_ms": p(lat, 50), "p95_ms": p(lat, 95), "p99_ms": p(lat, 99),
+            "max_ms": round(float(lat.max()), 2) if len(lat) else None,
+            "p99_incl_queue_ms": p(total, 99),
+            "concurrency": CONCURRENCY, "rate": RATE, "source": SOURCE,
+            "mode": "inprocess" if INPROCESS else API_BASE,
+        })
+    return out
+
+
+def main():
+    queries = load_queries(SOURCE)
+    if not queries:
+        raise SystemExit(f"❌ Sin consultas en {SOURCE}")
+    post = inprocess_client() if INPROCESS else http_client()
+    print(f"🚦 {len(queries)} consultas ({SOURCE}) | {REQUESTS_PER_ENDPOINT} peticiones/endpoint | "
+          f"concurrencia={CONCURRENCY} | rate={RATE or 'máx'}")
+    rows = []
+    for ep in ENDPOINTS:
+        rows += run_endpoint(post, ep, queries)
+    df = pd.DataFrame(rows)
+    summary = summarize(df)
+
+    REPORTS_DIR.mkdir(exist_ok=True)
+    csv_path = REPORTS_DIR / f"load_test_{LABEL}.csv"
+    json_path = REPORTS_DIR / f"load_test_{LABEL}.json"
+    df.to_csv(csv_path, index=False)
+    json_path.write_text(json.dumps({"label": LABEL, "summary": summary}, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(pd.DataFrame(summary)[["endpoint", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms"]].to_string(index=False))
+    print(f"\n📄 Resultados guardados en {csv_path} y {json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,18 +6,22 @@ OUT_PATH  = BASE / "data/gold_weak.jsonl"
 
 API = os.getenv("RAG_API", "http://localhost:8000")
 TOP_K = int(os.getenv("GOLD_TOPK", "10"))
-
-def query_api(endpoint: str, q: str, k: int):
-    url = f"{API}/{endpoint}"
-    data = {"query": q, "top_k": k}
-    try:
-        r = requests.post(url, json=data, timeout=30)
-        r.raise_for_status()
-        resp = r.json()
-        return [d["id"] for d in resp.get("results", [])]
-    except Exception as e:
-        print(f"⚠️ Error en {endpoint} para '{q}': {e}")
-        return []
+BATCH = int(os.getenv("GOLD_BATCH", "64"))  # <= BATCH_MAX_QUERIES de la API
+
+def query_api_batch(endpoint: str, qs, k: int):
+    """Una sola llamada a /<endpoint>_batch; devuelve {query: [ids]}."""
+    url = f"{API}/{endpoint}_batch"
+    out = {}
+    for i in range(0, len(qs), BATCH):
+        data = {"queries": qs[i:i + BATCH], "top_k": k}
+        try:
+            r = requests.post(url, json=data, timeout=120)
+            r.raise_for_status()
+            for item in r.json().get("results", []):
+                out[item["query"]] = [d["id"] for d in item.get("results", [])]
+        except Exception as e:
+            print(f"⚠️ Error en {endpoint}_batch (lote {i // BATCH + 1}): {e}")
+    return out
 
 def main():
     if not SEED_PATH.exists():
@@ -25,10 +29,13 @@ def main():
     lines = [l.strip() for l in SEED_PATH.read_text(encoding="utf-8").splitlines() if l.strip()]
     out = OUT_PATH.open("w", encoding="utf-8")
 
+    print(f"🔍 Procesando {len(lines)} queries en lote...")
+    solr_all = query_api_batch("query_solr", lines, TOP_K)
+    milvus_all = query_api_batch("query_milvus", lines, TOP_K)
+
     for q in lines:
-        print(f"🔍 Procesando query: {q}")
-        solr_docs = query_api("query_solr", q, TOP_K)
-        milvus_docs = query_api("query_milvus", q, TOP_K)
+        solr_docs = solr_all.get(q, [])
+        milvus_docs = milvus_all.get(q, [])
 
         intersection = list(set(solr_docs) & set(milvus_docs))
         union = list(set(solr_docs) | set(milvus_docs))
@@ -0,0 +1,104 @@
+# services/api/collection_manager.py
+# Estado de carga de la colección de Milvus, refrescado en segundo plano (fuera del camino de búsqueda).
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+if TYPE_CHECKING:
+    from pymilvus import Collection
+
+
+class CollectionManager:
+    """Mantiene una Collection cargada y la recarga solo si Milvus la reporta liberada o recreada."""
+
+    def __init__(self, name: str, connect: Callable[[], None], refresh_s: float = 30.0):
+        self.name = name
+        self.connect = connect
+        self.refresh_s = float(refresh_s)
+        self._collection: Optional["Collection"] = None
+        self._collection_id = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.loads = 0
+        self.last_check = 0.0
+        self.last_state = "unknown"
+        self.last_error: Optional[str] = None
+
+    def get(self) -> "Collection":
+        """Camino rápido: devuelve la colección ya cargada sin ida y vuelta a Milvus."""
+        col = self._collection
+        if col is not None:
+            return col
+        with self._lock:
+            if self._collection is None:
+                self._load()
+            return self._collection
+
+    def invalidate(self) -> None:
+        """Fuerza recarga en el próximo get() (p. ej. tras un error de búsqueda)."""
+        with self._lock:
+            self._collection = None
+
+    def refresh(self) -> None:
+        """Consulta el estado en Milvus y recarga si hace falta."""
+        from pymilvus import Collection, utility
+
+        try:
+            self.connect()
+            if not utility.has_collection(self.name):
+                self.last_state = "missing"
+                with self._lock:
+                    self._collection = None
+                return
+            state = str(utility.load_state(self.name))
+            self.last_state = state
+            col_id = Collection(self.name).describe().get("collection_id")
+            changed = self._collection_id is not None and col_id != self._collection_id
+            if changed or "Loaded" not in state or self._collection is None:
+                with self._lock:
+                    print(f"🔄 Recargando colección {self.name} (estado={state}, cambiada={changed})")
+                    self._load()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"⚠️ Refresco de colección {self.name} falló: {e}")
+        finally:
+            self.last_check = time.time()
+
+    def start(self) -> None:
+        if self.refresh_s <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="collection-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "name": self.name,
+            "loaded": self._collection is not None,
+            "state": self.last_state,
+            "loads": self.loads,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+        }
+
+    def _load(self) -> None:
+        from pymilvus import Collection, utility
+
+        self.connect()
+        if not utility.has_collection(self.name):
+            raise RuntimeError(f"⚠️ La colección '{self.name}' no existe en Milvus.")
+        col = Collection(self.name)
+        col.load()
+        self._collection_id = col.describe().get("collection_id")
+        self._collection = col
+        self.loads += 1
+        self.last_state = "Loaded"
+        print(f"✅ Colección {col.name} cargada en memoria.")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_s):
+            self.refresh()
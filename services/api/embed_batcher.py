@@ -0,0 +1,89 @@
+# services/api/embed_batcher.py
+# Micro-batching de consultas: agrupa las peticiones concurrentes en un solo encode().
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+EncodeFn = Callable[[Sequence[str]], np.ndarray]
+
+
+class EmbeddingBatcher:
+    """Hilo de fondo que junta textos durante `window_ms` (o hasta `max_batch`) y los codifica juntos."""
+
+    def __init__(self, encode_fn: EncodeFn, max_batch: int = 32, window_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, int(max_batch))
+        self.window_s = max(0.0, float(window_ms)) / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, text: str) -> "Future[np.ndarray]":
+        fut: "Future[np.ndarray]" = Future()
+        self._ensure_worker()
+        self._queue.put((text, fut))
+        return fut
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        if self.window_s == 0 and self.max_batch == 1:
+            return self.encode_fn([text])[0]
+        return self.submit(text).result(timeout=timeout)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": (self.items / self.batches) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "window_ms": self.window_s * 1000.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        # La ventana empieza con el primer elemento: latencia añadida acotada a window_s
+        end = time.monotonic() + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = end - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # Deduplicar textos idénticos dentro del lote
+            uniq: List[str] = []
+            pos = {}
+            for text, _ in batch:
+                if text not in pos:
+                    pos[text] = len(uniq)
+                    uniq.append(text)
+            try:
+                vecs = self.encode_fn(uniq)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for text, fut in batch:
+                fut.set_result(vecs[pos[text]])
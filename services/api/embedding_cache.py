@@ -0,0 +1,94 @@
+# services/api/embedding_cache.py
+# Caché LRU/TTL en memoria para embeddings de consultas.
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(q: str) -> str:
+    """NFC + espacios colapsados. No se pasa a minúsculas: el tokenizer del modelo distingue mayúsculas."""
+    return " ".join(unicodedata.normalize("NFC", q or "").split())
+
+
+class EmbeddingCache:
+    """LRU acotado por número de entradas y por bytes, con expiración opcional (TTL)."""
+
+    def __init__(self, max_items: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 0.0):
+        self.max_items = max(0, int(max_items))
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_s = float(ttl_s)
+        self._data: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0 and self.max_bytes > 0
+
+    def get(self, model_name: str, q: str) -> Optional[np.ndarray]:
+        key = (model_name, normalize_query(q))
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            vec, ts = item
+            if self.ttl_s > 0 and time.monotonic() - ts > self.ttl_s:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, model_name: str, q: str, vec: np.ndarray) -> None:
+        if not self.enabled:
+            return
+        vec = np.asarray(vec, dtype=np.float32)
+        if vec.nbytes > self.max_bytes:
+            return
+        vec.setflags(write=False)
+        key = (model_name, normalize_query(q))
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (vec, time.monotonic())
+            self._bytes += vec.nbytes
+            while len(self._data) > self.max_items or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+            }
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        vec, _ = self._data.pop(key)
+        self._bytes -= vec.nbytes
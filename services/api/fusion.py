@@ -0,0 +1,67 @@
+# services/api/fusion.py
+# Fusión de N listas rankeadas: RRF ponderado y CombSUM sobre scores normalizados (min-max / z-score).
+# No modifica las listas de entrada: solo se crean dicts nuevos para los k documentos devueltos.
+# Las ramas traen solo id + score; los textos se añaden después (hydration.py).
+import heapq
+import math
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+METHODS = ("rrf", "combsum_minmax", "combsum_zscore")
+
+Doc = Dict[str, Any]
+
+
+def _minmax(scores: List[float]) -> List[float]:
+    lo, hi = min(scores), max(scores)
+    if hi == lo:
+        return [1.0] * len(scores)
+    return [(s - lo) / (hi - lo) for s in scores]
+
+
+def _zscore(scores: List[float]) -> List[float]:
+    n = len(scores)
+    mean = sum(scores) / n
+    std = math.sqrt(sum((s - mean) ** 2 for s in scores) / n)
+    if std == 0:
+        return [0.0] * n
+    return [(s - mean) / std for s in scores]
+
+
+def _contributions(docs: Sequence[Doc], method: str, rrf_k: float, score_key: str) -> List[float]:
+    if method == "rrf":
+        return [1.0 / (rrf_k + i + 1) for i in range(len(docs))]
+    scores = [float(d.get(score_key) or 0.0) for d in docs]
+    return _minmax(scores) if method == "combsum_minmax" else _zscore(scores)
+
+
+def fuse(lists: Mapping[str, Sequence[Doc]], k: int, method: str = "rrf", rrf_k: float = 60.0,
+         weights: Optional[Mapping[str, float]] = None, id_key: str = "id", score_key: str = "score") -> List[Doc]:
+    """Fusiona {nombre_rama: docs} y devuelve los k mejores con `fusion_score`
+    (y `rrf_score` con method="rrf", como el antiguo rrf_merge). Empates: orden de aparición."""
+    if method not in METHODS:
+        raise ValueError(f"fusión desconocida: {method} (opciones: {', '.join(METHODS)})")
+    if rrf_k < 0:
+        raise ValueError("rrf_k debe ser >= 0")
+    weights = weights or {}
+    total: Dict[Any, float] = {}
+    first: Dict[Any, Doc] = {}
+    for name, docs in lists.items():
+        w = float(weights.get(name, 1.0))
+        if not docs or w == 0.0:
+            continue
+        for d, c in zip(docs, _contributions(docs, method, rrf_k, score_key)):
+            rid = d[id_key]
+            if rid in total:
+                total[rid] += w * c
+            else:
+                total[rid] = w * c
+                first[rid] = d
+
+    top = heapq.nlargest(k, total.items(), key=lambda kv: kv[1])
+    out = []
+    for rid, score in top:
+        obj = dict(first[rid], fusion_score=score)
+        if method == "rrf":
+            obj["rrf_score"] = score
+        out.append(obj)
+    return out
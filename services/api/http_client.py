@@ -0,0 +1,75 @@
+# services/api/http_client.py
+# Cliente HTTP compartido (keep-alive + pool + reintentos) para las llamadas a Solr.
+import os
+import threading
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_POOL_SIZE         = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_RETRIES           = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_S         = float(os.getenv("HTTP_BACKOFF_S", "0.1"))
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "2"))
+HTTP_READ_TIMEOUT_S    = float(os.getenv("HTTP_READ_TIMEOUT_S", "15"))
+
+_session: Optional[requests.Session] = None
+_session_no_retry: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+def default_timeout() -> Tuple[float, float]:
+    return (HTTP_CONNECT_TIMEOUT_S, HTTP_READ_TIMEOUT_S)
+
+
+def deadline_timeout(remaining_s: float) -> Tuple[float, float]:
+    """(connect, read) acotados por el tiempo que le queda a la rama.
+
+    requests aplica el read a cada lectura del socket, no a la petición entera: una respuesta que
+    llega a trozos puede pasar del plazo. El plazo total lo garantiza iter_legs, que deja de esperar
+    la rama (estado "timeout") aunque la llamada siga en curso."""
+    remaining_s = max(0.001, remaining_s)
+    return (min(HTTP_CONNECT_TIMEOUT_S, remaining_s), min(HTTP_READ_TIMEOUT_S, remaining_s))
+
+
+def _build_session(retries: int) -> requests.Session:
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        backoff_factor=HTTP_BACKOFF_S,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def get_session(retries: bool = True) -> requests.Session:
+    """Sesión síncrona única del proceso; solo reintenta métodos idempotentes (GET/HEAD).
+    retries=False: sesión sin reintentos para llamadas con plazo (ramas de /ask)."""
+    global _session, _session_no_retry
+    if retries:
+        if _session is None:
+            with _lock:
+                if _session is None:
+                    _session = _build_session(HTTP_RETRIES)
+        return _session
+    if _session_no_retry is None:
+        with _lock:
+            if _session_no_retry is None:
+                _session_no_retry = _build_session(0)
+    return _session_no_retry
+
+
+def close_clients() -> None:
+    global _session, _session_no_retry
+    for sess in (_session, _session_no_retry):
+        if sess is not None:
+            sess.close()
+    _session = _session_no_retry = None
@@ -0,0 +1,67 @@
+# services/api/hydration.py
+# Hidratación tardía: las ramas (Solr, Milvus, motores locales) devuelven solo id + score y
+# los campos de texto se leen del corpus local únicamente para el top-k final, tras la fusión.
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from corpus_store import get_corpus_store
+from lexical_engine import tokenize
+
+CORPUS_PATH   = Path(os.getenv("CORPUS_PATH", "/app/data/corpus/books_preprocessed_MWE.jsonl"))
+SNIPPET_CHARS = int(os.getenv("SNIPPET_CHARS", "0"))  # 0 = texto completo en text_raw
+
+# Campos que las ramas piden a los backends (fl de Solr / output_fields de Milvus)
+LEG_FIELDS = ("id",)
+
+
+class CorpusUnavailable(RuntimeError):
+    """El corpus (o su índice de offsets) no se puede abrir: no hay textos que devolver."""
+
+
+def corpus_available() -> bool:
+    return CORPUS_PATH.exists()
+
+
+def make_snippet(text: str, query: str, max_chars: int) -> str:
+    """Ventana de ~max_chars alrededor de la primera aparición de un término de la consulta
+    (o el inicio del texto), cortada en límites de palabra."""
+    text = text or ""
+    if len(text) <= max_chars:
+        return text
+    terms = sorted(set(tokenize(query)), key=len, reverse=True)
+    m = re.search(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\b", text, re.IGNORECASE) if terms else None
+    start = max(0, m.start() - max_chars // 4) if m else 0
+    end = min(len(text), start + max_chars)
+    start = max(0, end - max_chars)
+    if start > 0:
+        sp = text.find(" ", start)
+        start = sp + 1 if 0 <= sp < end else start
+    if end < len(text):
+        sp = text.rfind(" ", start, end)
+        end = sp if sp > start else end
+    return ("…" if start > 0 else "") + text[start:end].strip() + ("…" if end < len(text) else "")
+
+
+def hydrate(docs: List[Dict[str, Any]], query: str = "", snippet_chars: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Añade section_title y text_raw (o snippet si snippet_chars > 0) a los docs, en su sitio.
+    Los ids que no estén en el corpus quedan con los campos a None; si el corpus no se puede
+    abrir lanza CorpusUnavailable."""
+    if not docs:
+        return docs
+    n = SNIPPET_CHARS if snippet_chars is None else snippet_chars
+    try:
+        store = get_corpus_store(CORPUS_PATH)
+    except OSError as e:
+        raise CorpusUnavailable(f"corpus no disponible ({CORPUS_PATH}): {e}") from e
+    for d, src in zip(docs, store.get_many([str(d["id"]) for d in docs])):
+        src = src or {}
+        d["section_title"] = src.get("section_title")
+        text = src.get("text_raw")
+        if n > 0:
+            d["snippet"] = make_snippet(text, query, n) if text is not None else None
+            d.pop("text_raw", None)
+        else:
+            d["text_raw"] = text
+    return docs
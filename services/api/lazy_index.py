@@ -0,0 +1,49 @@
+# services/api/lazy_index.py
+# Índices en proceso (vectorial, BM25) cargados de forma perezosa y recargados por generación.
+import threading
+import time
+from typing import Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyIndex(Generic[T]):
+    """Construye el índice con `loader` en el primer get(); observe_generation() lo descarta
+    cuando el indexador correspondiente publica una generación nueva."""
+
+    def __init__(self, name: str, loader: Callable[[], T]):
+        self.name = name
+        self._loader = loader
+        self._index: Optional[T] = None
+        self._lock = threading.Lock()
+        self._last_gen: Optional[Hashable] = None
+        self.loads = 0
+        self.load_s = 0.0
+
+    def get(self) -> T:
+        idx = self._index
+        if idx is not None:
+            return idx
+        with self._lock:
+            if self._index is None:
+                t = time.perf_counter()
+                self._index = self._loader()
+                self.load_s = time.perf_counter() - t
+                self.loads += 1
+                print(f"✅ Índice {self.name} local: {getattr(self._index, 'size', '?')} docs ({self.load_s:.2f}s)")
+            return self._index
+
+    def reload(self) -> None:
+        with self._lock:
+            self._index = None
+
+    def observe_generation(self, gen: Hashable) -> None:
+        if gen != self._last_gen:
+            if self._last_gen is not None:
+                self.reload()
+            self._last_gen = gen
+
+    def status(self) -> Dict[str, object]:
+        idx = self._index
+        return {"loaded": idx is not None, "size": getattr(idx, "size", 0) if idx is not None else 0,
+                "loads": self.loads, "load_s": round(self.load_s, 3)}
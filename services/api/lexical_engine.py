@@ -0,0 +1,153 @@
+# services/api/lexical_engine.py
+# Motor BM25 en proceso con índice invertido en arrays (CSR por campo), equivalente aproximado
+# al edismax de Solr sobre text_raw / lemmas / section_title con boosts por campo (qf).
+import math
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from corpus_store import CorpusStore, get_corpus_store
+
+CORPUS_PATH = Path(os.getenv("CORPUS_PATH", "/app/data/corpus/books_preprocessed_MWE.jsonl"))
+BM25_K1     = float(os.getenv("BM25_K1", "1.2"))   # valores por defecto de Lucene/Solr
+BM25_B      = float(os.getenv("BM25_B", "0.75"))
+BM25_TIE    = float(os.getenv("BM25_TIE", "0.0"))  # tie de dismax (0 = solo el mejor campo por término)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Aproxima el text_general de Solr: tokens alfanuméricos en minúsculas. No quita stopwords
+    porque el stopwords.txt de rag_core está vacío (lo comprueba scripts/check_bm25_local.py)."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def parse_qf(qf: str) -> Dict[str, float]:
+    """"text_raw^2 lemmas section_title^0.5" -> {campo: boost}, como el parámetro qf de edismax."""
+    fields: Dict[str, float] = {}
+    for part in (qf or "").split():
+        name, _, boost = part.partition("^")
+        fields[name] = float(boost) if boost else 1.0
+    return fields
+
+
+class FieldIndex:
+    """Postings de un campo: para el término t, docs[indptr[t]:indptr[t+1]] y sus tf."""
+
+    def __init__(self, vocab: Dict[str, int], indptr: np.ndarray, docs: np.ndarray,
+                 tfs: np.ndarray, doc_len: np.ndarray):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.mean()) if len(doc_len) and doc_len.mean() > 0 else 1.0
+
+    @classmethod
+    def build(cls, token_lists: List[List[str]]) -> "FieldIndex":
+        vocab: Dict[str, int] = {}
+        term_col, doc_col, tf_col = [], [], []
+        doc_len = np.zeros(len(token_lists), dtype=np.float32)
+        for d, toks in enumerate(token_lists):
+            doc_len[d] = len(toks)
+            counts: Dict[int, int] = {}
+            for t in toks:
+                tid = vocab.setdefault(t, len(vocab))
+                counts[tid] = counts.get(tid, 0) + 1
+            term_col.extend(counts)
+            doc_col.extend([d] * len(counts))
+            tf_col.extend(counts.values())
+        terms = np.asarray(term_col, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")  # estable: docs ascendentes dentro de cada término
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=indptr[1:])
+        return cls(vocab, indptr, np.asarray(doc_col, dtype=np.int32)[order],
+                   np.asarray(tf_col, dtype=np.float32)[order], doc_len)
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        tid = self.vocab.get(term)
+        if tid is None:
+            return None
+        lo, hi = self.indptr[tid], self.indptr[tid + 1]
+        return self.docs[lo:hi], self.tfs[lo:hi]
+
+
+class BM25Index:
+    """BM25 multi-campo: por término se combina el score de cada campo (boost incluido) con
+    max + tie * (resto), y se suma sobre los términos de la consulta, como dismax."""
+
+    def __init__(self, ids: List[str], corpus: CorpusStore, fields: Dict[str, FieldIndex],
+                 k1: float = BM25_K1, b: float = BM25_B):
+        self.ids = ids
+        self.corpus = corpus
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        # Normalización de longitud precalculada por campo: k1 * (1 - b + b * dl / avgdl)
+        self._norm = {name: (k1 * (1 - b + b * f.doc_len / f.avgdl)).astype(np.float32)
+                      for name, f in fields.items()}
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_corpus(cls, path: Path = CORPUS_PATH, fields: Iterable[str] = ("text_raw", "lemmas", "section_title"),
+                    k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        corpus = get_corpus_store(path)
+        ids, tokens = corpus.ids(), {f: [] for f in fields}
+        for d in corpus.get_many(ids):
+            # Mismos campos que index_corpus.py envía a Solr (lemmas como texto unido por espacios)
+            values = {
+                "section_title": d.get("section_title", "") or "",
+                "text_raw": d.get("text_raw", "") or "",
+                "lemmas": " ".join(d.get("lemmas", []) or []),
+            }
+            for f in tokens:
+                tokens[f].append(tokenize(values.get(f, "")))
+        return cls(ids, corpus, {f: FieldIndex.build(t) for f, t in tokens.items()}, k1, b)
+
+    def idf(self, df: int) -> float:
+        n = len(self.ids)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str, qf: Dict[str, float], tie: float = BM25_TIE) -> np.ndarray:
+        n = len(self.ids)
+        total = np.zeros(n, dtype=np.float32)
+        best = np.zeros(n, dtype=np.float32)
+        summed = np.zeros(n, dtype=np.float32)
+        for term in tokenize(query):
+            best.fill(0.0)
+            summed.fill(0.0)
+            touched = []
+            for name, boost in qf.items():
+                f = self.fields.get(name)
+                post = f.postings(term) if f is not None else None
+                if post is None:
+                    continue
+                docs, tfs = post
+                contrib = boost * self.idf(len(docs)) * tfs * (self.k1 + 1) / (tfs + self._norm[name][docs])
+                # Los docs de una lista de postings son únicos: la asignación indexada es segura
+                best[docs] = np.maximum(best[docs], contrib)
+                summed[docs] += contrib
+                touched.append(docs)
+            if touched:
+                idx = np.unique(np.concatenate(touched)) if len(touched) > 1 else touched[0]
+                total[idx] += best[idx] + tie * (summed[idx] - best[idx])
+        return total
+
+    def search(self, query: str, k: int, qf: Dict[str, float], tie: float = BM25_TIE) -> List[Tuple[str, float]]:
+        s = self.scores(query, qf, tie)
+        cand = np.flatnonzero(s > 0)
+        if len(cand) > k:
+            cand = cand[np.argpartition(-s[cand], k - 1)[:k]]
+        order = cand[np.argsort(-s[cand], kind="stable")]
+        return [(self.ids[i], float(s[i])) for i in order]
+
+    def hits(self, query: str, k: int, qf: Dict[str, float], engine: str = "local_bm25") -> List[Dict]:
+        """Mismo formato que los docs de main.search_solr: solo id y score (se hidrata tras la fusión)."""
+        return [{"id": sid, "score": score, "engine": engine, "norm_score": score}
+                for sid, score in self.search(query, k, qf)]
@@ -1,11 +1,30 @@
-import os, time
-from typing import List, Dict, Any
-from fastapi import FastAPI, HTTPException
+import contextvars, json, os, threading, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, List, Dict, Any, Callable, Iterator, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-import requests
 
-from pymilvus import connections, Collection, utility
-from sentence_transformers import SentenceTransformer
+from collection_manager import CollectionManager
+from embed_batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache, normalize_query
+from http_client import close_clients, deadline_timeout, default_timeout, get_session
+from model_backend import EMBED_BACKEND, load_sentence_model, model_id
+from result_cache import IndexGeneration, ResultCache
+from fusion import METHODS as FUSION_METHODS, fuse
+from corpus_store import get_corpus_store
+from hydration import CORPUS_PATH, LEG_FIELDS, CorpusUnavailable, corpus_available, hydrate
+from lazy_index import LazyIndex
+import metrics
+from metrics import BACKEND_ERRORS, BACKEND_FALLBACKS, BACKEND_TIMEOUTS, stage
+from lexical_engine import BM25Index, parse_qf
+from vector_engine import LocalVectorIndex
+from warmup import Readiness
+
+# pymilvus y sentence-transformers (torch) se importan solo al usarse: con VECTOR_ENGINE=none
+# el proceso no los carga nunca (ver scripts/bench_api_modes.py)
+if TYPE_CHECKING:
+    from pymilvus import Collection
 
 app = FastAPI(title="RAG Demo - Solr & Milvus (v2)")
 
@@ -17,26 +36,114 @@ COLLECTION_NAME = os.getenv("COLLECTION_NAME", "rag_corpus")
 EMBED_FIELD     = os.getenv("EMBED_FIELD", "embedding")
 MODEL_NAME      = os.getenv("MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
 TOPK_MAX        = int(os.getenv("TOPK_MAX", "20"))
+SOLR_QF         = os.getenv("SOLR_QF", "text_raw lemmas section_title")
+
+# Caché de embeddings de consultas (0 desactiva)
+EMBED_CACHE_MAX_ITEMS = int(os.getenv("EMBED_CACHE_MAX_ITEMS", "10000"))
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EMBED_CACHE_TTL_S     = float(os.getenv("EMBED_CACHE_TTL_S", "0"))
+
+# Micro-batching del encoder (ventana 0 y lote 1 = sin agrupar)
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX       = int(os.getenv("EMBED_BATCH_MAX", "32"))
+
+# /ask: ejecución concurrente de ambas ramas con plazo propio por backend
+SOLR_DEADLINE_S   = float(os.getenv("SOLR_DEADLINE_S", "5"))
+MILVUS_DEADLINE_S = float(os.getenv("MILVUS_DEADLINE_S", "5"))
+ASK_POOL_WORKERS  = int(os.getenv("ASK_POOL_WORKERS", "16"))
+
+# Fusión de ramas en /ask por defecto (cada petición puede cambiarla)
+FUSION_METHOD = os.getenv("FUSION_METHOD", "rrf")
+FUSION_RRF_K  = float(os.getenv("FUSION_RRF_K", "60"))
+
+# Endpoints batch: máximo de consultas por petición
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "64"))
+SOLR_FANOUT       = int(os.getenv("SOLR_FANOUT", "8"))
+
+# Caché de respuestas de /ask, invalidada por la generación que publican los indexadores
+RESULT_CACHE_MAX_ITEMS = int(os.getenv("RESULT_CACHE_MAX_ITEMS", "2048"))
+INDEX_GEN_PATH         = os.getenv("INDEX_GEN_PATH", "/app/data/index_generation.json")
+INDEX_GEN_CHECK_S      = float(os.getenv("INDEX_GEN_CHECK_S", "2"))
+
+# Refresco en segundo plano del estado de carga de la colección (0 desactiva)
+COLLECTION_REFRESH_S = float(os.getenv("COLLECTION_REFRESH_S", "30"))
+
+# Motor de la rama vectorial: "milvus", "local" (NumPy en proceso), "fallback" (Milvus y, si falla, local)
+# o "none" (instancia solo léxica: ni modelo ni pymilvus; backend="both" se sirve solo con Solr)
+VECTOR_ENGINE = os.getenv("VECTOR_ENGINE", "milvus").lower()
+# Sin almacén de embeddings, 1 = codificar el corpus al arrancar el motor local (pruebas)
+VECTOR_LOCAL_ENCODE = os.getenv("VECTOR_LOCAL_ENCODE", "0") == "1"
+# 1 = si no hay almacén del backend efectivo (p. ej. modelo@onnx-int8), usar el de torch fp32:
+# consultas de un backend contra documentos de otro (paridad medida con bench_encoder_backends.py)
+VECTOR_STORE_FP32_FALLBACK = os.getenv("VECTOR_STORE_FP32_FALLBACK", "0") == "1"
+
+# Motor de la rama léxica: "solr", "local" (BM25 en proceso) o "fallback" (Solr y, si falla, local)
+LEXICAL_ENGINE = os.getenv("LEXICAL_ENGINE", "solr").lower()
+
+# Calentamiento en el arranque (ver /ready)
+WARMUP_ENCODES = int(os.getenv("WARMUP_ENCODES", "3"))     # encodes de prueba tras cargar el modelo
+WARMUP_RETRY_S = float(os.getenv("WARMUP_RETRY_S", "3"))   # espera entre reintentos de un componente
+WARMUP_WAIT_S  = float(os.getenv("WARMUP_WAIT_S", "0"))    # > 0: el arranque espera hasta N s a estar listo
 
 # Carga perezosa
 _model = None
-_collection = None
+_model_id: Optional[str] = None
+_model_lock = threading.Lock()
 _milvus_connected = False
+_embed_cache = EmbeddingCache(EMBED_CACHE_MAX_ITEMS, EMBED_CACHE_MAX_BYTES, EMBED_CACHE_TTL_S)
+_embed_batcher = EmbeddingBatcher(
+    lambda texts: get_model().encode(list(texts), batch_size=len(texts), normalize_embeddings=True),
+    max_batch=EMBED_BATCH_MAX,
+    window_ms=EMBED_BATCH_WINDOW_MS,
+)
+_leg_pool = ThreadPoolExecutor(max_workers=ASK_POOL_WORKERS, thread_name_prefix="ask-leg")
+_result_cache = ResultCache(RESULT_CACHE_MAX_ITEMS)
+_index_gen = IndexGeneration(INDEX_GEN_PATH, INDEX_GEN_CHECK_S)
+# Pool aparte para el fan-out de Solr: las ramas de /ask_batch lo usan sin bloquear _leg_pool
+_solr_pool = ThreadPoolExecutor(max_workers=SOLR_FANOUT, thread_name_prefix="solr-fanout")
+# Plazo absoluto (time.monotonic) de la rama en curso; lo fija iter_legs y lo heredan los fan-out
+_leg_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("leg_deadline", default=None)
+
+
+def leg_remaining() -> Optional[float]:
+    """Segundos que le quedan a la rama en curso; None fuera de /ask (sin plazo)."""
+    deadline = _leg_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
 
 
 # === MODELOS DE PETICIÓN ===
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 3
+    snippet_chars: Optional[int] = None  # > 0: "snippet" de ~N caracteres en lugar de text_raw
 
 class AskRequest(BaseModel):
     query: str
     top_k: int = 5
     backend: str = "both"  # "solr" | "milvus" | "both"
+    fusion: Optional[str] = None  # "rrf" | "combsum_minmax" | "combsum_zscore"
+    rrf_k: Optional[float] = None
+    weights: Optional[Dict[str, float]] = None  # peso por rama, p. ej. {"solr": 1.0, "milvus": 2.0}
+    snippet_chars: Optional[int] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 3
+    snippet_chars: Optional[int] = None
+
+class AskBatchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    backend: str = "both"
+    fusion: Optional[str] = None
+    rrf_k: Optional[float] = None
+    weights: Optional[Dict[str, float]] = None
+    snippet_chars: Optional[int] = None
 
 
 @app.get("/health")
 def health():
+    """Liveness: el proceso responde. Para decidir si recibe tráfico, usar /ready."""
     return {"status": "ok"}
 
 
@@ -45,6 +152,8 @@ def connect_milvus_with_retry(retries: int = 20, sleep_s: float = 1.5):
     global _milvus_connected
     if _milvus_connected:
         return
+    from pymilvus import connections
+
     for i in range(1, retries + 1):
         try:
             connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
@@ -57,42 +166,212 @@ def connect_milvus_with_retry(retries: int = 20, sleep_s: float = 1.5):
     raise RuntimeError("❌ No se pudo conectar a Milvus tras varios intentos.")
 
 
-def get_collection() -> Collection:
-    global _collection
-    if _collection is None:
-        connect_milvus_with_retry()
-        if not utility.has_collection(COLLECTION_NAME):
-            raise RuntimeError(f"⚠️ La colección '{COLLECTION_NAME}' no existe en Milvus.")
-        _collection = Collection(COLLECTION_NAME)
-        _collection.load()
-        print(f"✅ Colección {_collection.name} cargada en memoria.")
-    return _collection
+_collections = CollectionManager(COLLECTION_NAME, connect_milvus_with_retry, refresh_s=COLLECTION_REFRESH_S)
+
+
+def get_collection() -> "Collection":
+    return _collections.get()
+
+
+def load_local_vectors() -> LocalVectorIndex:
+    mid = embed_model_id()
+    try:
+        return LocalVectorIndex.from_store([mid])
+    except FileNotFoundError:
+        if VECTOR_STORE_FP32_FALLBACK and mid != MODEL_NAME:
+            try:
+                index = LocalVectorIndex.from_store([MODEL_NAME])
+                print(f"⚠️ Sin almacén para {mid}: documentos de torch fp32 con consultas de {mid}")
+                return index
+            except FileNotFoundError:
+                pass
+        if not VECTOR_LOCAL_ENCODE:
+            raise
+        print("⚠️ Sin almacén de embeddings; se codifica el corpus en proceso")
+        return LocalVectorIndex.from_corpus(
+            lambda texts: get_model().encode(texts, batch_size=len(texts), normalize_embeddings=True))
+
+
+_vector_local = LazyIndex("vectorial", load_local_vectors)
+_lexical_qf = parse_qf(SOLR_QF)
+_lexical_local = LazyIndex("BM25", lambda: BM25Index.from_corpus(fields=_lexical_qf))
 
 
 def get_model():
-    global _model
+    global _model, _model_id
     if _model is None:
-        _model = SentenceTransformer(MODEL_NAME)
+        # El warm-up y el índice vectorial local pueden pedirlo a la vez desde hilos distintos
+        with _model_lock:
+            if _model is None:
+                model, backend = load_sentence_model(MODEL_NAME, EMBED_BACKEND)
+                print(f"✅ Modelo {MODEL_NAME} cargado (backend={backend}).")
+                if backend != EMBED_BACKEND:
+                    print(f"⚠️ EMBED_BACKEND={EMBED_BACKEND} no disponible: vectores de {backend}")
+                _model_id = model_id(MODEL_NAME, backend)
+                _model = model
     return _model
 
 
+def embed_model_id() -> str:
+    """Clave de caché/almacén con el backend efectivo (tras un fallback, no el configurado)."""
+    get_model()
+    return _model_id
+
+
+def embed_wait_timeout() -> Optional[float]:
+    """Espera máxima al encode dentro de una rama (su plazo restante); TimeoutError si ya no queda."""
+    remaining = leg_remaining()
+    if remaining is not None and remaining <= 0:
+        raise TimeoutError("plazo de la rama agotado antes del embedding")
+    return remaining
+
+
+def encode_query(q: str) -> List[float]:
+    """Embedding normalizado de la consulta, pasando por la caché LRU y el micro-batcher.
+    Dentro de una rama la espera al batcher se corta en su plazo (TimeoutError)."""
+    mid = embed_model_id()
+    vec = _embed_cache.get(mid, q)
+    if vec is None:
+        vec = _embed_batcher.encode(q, timeout=embed_wait_timeout())
+        _embed_cache.put(mid, q, vec)
+    return vec.tolist()
+
+
+def encode_queries(qs: List[str]) -> List[List[float]]:
+    """Como encode_query pero para varias consultas: los fallos de caché van en un único encode()."""
+    with stage("embed"):
+        if len(qs) == 1:
+            return [encode_query(qs[0])]
+        mid = embed_model_id()
+        vecs = [_embed_cache.get(mid, q) for q in qs]
+        missing = list(dict.fromkeys(q for q, v in zip(qs, vecs) if v is None))
+        if missing:
+            embed_wait_timeout()  # un encode() directo no se puede interrumpir: solo se evita empezarlo
+            enc = get_model().encode(missing, batch_size=min(len(missing), 64), normalize_embeddings=True)
+            fresh = dict(zip(missing, enc))
+            for q in missing:
+                _embed_cache.put(mid, q, fresh[q])
+            vecs = [fresh[q] if v is None else v for q, v in zip(qs, vecs)]
+        return [v.tolist() for v in vecs]
+
+
 # === ARRANQUE AUTOMÁTICO ===
+def warm_model():
+    """Carga el modelo y hace encodes de prueba (1 consulta y un lote completo) para calentar los kernels."""
+    model = get_model()
+    for i in range(WARMUP_ENCODES):
+        model.encode(["warm-up"], batch_size=1, normalize_embeddings=True)
+        model.encode([f"consulta de calentamiento {j}" for j in range(EMBED_BATCH_MAX)],
+                     batch_size=EMBED_BATCH_MAX, normalize_embeddings=True)
+
+
+def ping_solr():
+    r = get_session().get(f"{BACKEND_SOLR}/select", params={"q": "*:*", "rows": 0, "wt": "json"}, timeout=2)
+    r.raise_for_status()
+
+
+_readiness = Readiness(WARMUP_RETRY_S)
+# Las ramas remotas solo son obligatorias sin motor local de respaldo
+# El corpus puede desaparecer tras el arranque (volumen desmontado): /ready lo vuelve a mirar
+_readiness.add("corpus", lambda: get_corpus_store(CORPUS_PATH), check=corpus_available)
+if VECTOR_ENGINE != "none":
+    _readiness.add("model", warm_model)
+if LEXICAL_ENGINE != "local":
+    _readiness.add("solr", ping_solr, required=LEXICAL_ENGINE == "solr")
+if LEXICAL_ENGINE in ("local", "fallback"):
+    _readiness.add("bm25_local", _lexical_local.get)
+if VECTOR_ENGINE in ("milvus", "fallback"):
+    _readiness.add("milvus", get_collection, required=VECTOR_ENGINE == "milvus",
+                   check=lambda: _collections.status()["loaded"])
+if VECTOR_ENGINE in ("local", "fallback"):
+    _readiness.add("vector_local", _vector_local.get)
+
+
 @app.on_event("startup")
 def on_startup():
-    """Warm-up de Solr y carga inicial de Milvus."""
+    """Calienta todos los componentes en paralelo; por defecto no bloquea el arranque (ver /ready)."""
+    _readiness.start()
+    if VECTOR_ENGINE in ("milvus", "fallback"):
+        _collections.start()
+    if WARMUP_WAIT_S > 0 and not _readiness.wait(WARMUP_WAIT_S):
+        print(f"⚠️ Arranque sin completar el warm-up tras {WARMUP_WAIT_S:.0f}s: {_readiness.status()}")
+
+
+@app.get("/ready")
+def ready():
+    """Readiness por componente: 200 solo cuando los obligatorios están calientes; 503 si no."""
+    status = _readiness.status()
+    if not status["ready"]:
+        return JSONResponse(status, status_code=503)
+    return status
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    _readiness.stop()
+    _collections.stop()
+    close_clients()
+
+
+@app.get("/config")
+def config():
+    """Configuración efectiva que determina los resultados; scripts/eval_runner.py la usa en su clave de caché."""
+    return {
+        "lexical_engine": LEXICAL_ENGINE,
+        "vector_engine": VECTOR_ENGINE,
+        "solr_qf": SOLR_QF,
+        "fusion_method": FUSION_METHOD,
+        "fusion_rrf_k": FUSION_RRF_K,
+        "embed_model": embed_model_id() if VECTOR_ENGINE != "none" else None,
+        "topk_max": TOPK_MAX,
+        "index_generation": _index_gen.current(),
+    }
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "embedding_cache": _embed_cache.stats(),
+        "embedding_batcher": _embed_batcher.stats(),
+        "result_cache": _result_cache.stats(),
+    }
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Latencia por endpoint y cabecera Server-Timing con el desglose por etapa."""
+    stages, token = metrics.begin_request()
+    t = time.perf_counter()
+    status = 500
     try:
-        requests.get(f"{BACKEND_SOLR}/select?q=*:*&rows=0", timeout=2)
-    except Exception:
-        pass
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        total = time.perf_counter() - t
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "other")
+        metrics.end_request(token)
+        if endpoint not in ("/metrics", "/ready"):  # sondas frecuentes, no tráfico
+            metrics.REQUEST_SECONDS.observe(total, endpoint=endpoint)
+            metrics.REQUESTS_TOTAL.inc(endpoint=endpoint, status=status)
+    response.headers["Server-Timing"] = metrics.server_timing(stages, total)
+    return response
 
-    for i in range(10):
-        try:
-            col = get_collection()
-            print("✅ Milvus cargado en memoria al inicio.")
-            break
-        except Exception as e:
-            print(f"⏳ Esperando Milvus... intento {i+1}/10 ({e})")
-            time.sleep(3)
+
+def _stats_gauge(stats_fn):
+    """Exporta los campos numéricos de un dict de stats() como un gauge con etiqueta stat."""
+    return lambda: {(("stat", key),): float(v) for key, v in stats_fn().items()
+                    if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+metrics.register_gauge("rag_embedding_cache", "Caché de embeddings de consultas", _stats_gauge(lambda: _embed_cache.stats()))
+metrics.register_gauge("rag_result_cache", "Caché de respuestas de /ask", _stats_gauge(lambda: _result_cache.stats()))
+metrics.register_gauge("rag_embedding_batcher", "Micro-batching del encoder", _stats_gauge(lambda: _embed_batcher.stats()))
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
@@ -100,24 +379,65 @@ def root():
     return {"message": "RAG API operativa 🚀 - Usa /query_solr, /query_milvus o /ask"}
 
 
+def clamp_k(top_k: int) -> int:
+    return max(1, min(top_k, TOPK_MAX))
+
+
+def check_batch(queries: List[str]) -> List[str]:
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_MAX_QUERIES} consultas por petición")
+    return [(q or "").strip() for q in queries]
+
+
 # === Endpoint 1: RAG–Solr ===
-@app.post("/query_solr")
-def query_solr(request: QueryRequest):
-    q = (request.query or "").strip()
-    k = max(1, min(request.top_k, TOPK_MAX))
+def search_solr(q: str, k: int) -> List[Dict[str, Any]]:
+    """Rama léxica según LEXICAL_ENGINE; mismo formato de docs en los tres modos."""
+    if LEXICAL_ENGINE == "local":
+        return search_bm25_local(q, k)
+    if LEXICAL_ENGINE == "fallback":
+        try:
+            return search_solr_remote(q, k)
+        except HTTPException as e:
+            print(f"⚠️ Solr no disponible, se usa BM25 local ({e.detail})")
+            BACKEND_FALLBACKS.inc(backend="solr")
+            return search_bm25_local(q, k)
+    return search_solr_remote(q, k)
+
+
+def search_bm25_local(q: str, k: int) -> List[Dict[str, Any]]:
+    """BM25 en proceso (lexical_engine.BM25Index) con los mismos campos y boosts que SOLR_QF."""
+    try:
+        _lexical_local.observe_generation(_index_gen.key(("solr",)))
+        with stage("bm25_local"):
+            return _lexical_local.get().hits(q, k, _lexical_qf)
+    except Exception as e:
+        BACKEND_ERRORS.inc(backend="bm25_local")
+        raise HTTPException(status_code=502, detail=f"BM25 local error: {e}")
+
 
+def search_solr_remote(q: str, k: int) -> List[Dict[str, Any]]:
     params = {
         "defType": "edismax",
         "q": q,
-        "qf": "text_raw lemmas section_title",
-        "fl": "id,section_title,text_raw,score",
+        "qf": SOLR_QF,
+        "fl": ",".join(LEG_FIELDS + ("score",)),
         "rows": k,
         "wt": "json"
     }
+    remaining = leg_remaining()
     try:
-        r = requests.get(f"{BACKEND_SOLR}/select", params=params, timeout=15)
-        r.raise_for_status()
+        with stage("solr"):
+            if remaining is None:
+                r = get_session().get(f"{BACKEND_SOLR}/select", params=params, timeout=default_timeout())
+            else:
+                # Dentro de una rama: sin reintentos y con el plazo restante, para no retener el worker
+                if remaining <= 0:
+                    raise TimeoutError("plazo de la rama agotado")
+                r = get_session(retries=False).get(f"{BACKEND_SOLR}/select", params=params,
+                                                   timeout=deadline_timeout(remaining))
+            r.raise_for_status()
     except Exception as e:
+        BACKEND_ERRORS.inc(backend="solr")
         raise HTTPException(status_code=502, detail=f"Solr error: {e}")
 
     data = r.json()
@@ -125,88 +445,378 @@ def query_solr(request: QueryRequest):
     for d in docs:
         d["engine"] = "solr"
         d["norm_score"] = float(d.get("score", 0.0))
-    return {"engine": "solr", "query": q, "results": docs}
+    return docs
 
 
-# === Endpoint 2: RAG–Milvus ===
-@app.post("/query_milvus")
-def query_milvus(request: QueryRequest):
+def search_solr_batch(qs: List[str], k: int) -> List[Dict[str, Any]]:
+    """Fan-out concurrente sobre el pool HTTP compartido; un fallo afecta solo a su consulta."""
+    # copy_context: las etapas de cada consulta se anotan en la petición en curso
+    futures = [_solr_pool.submit(contextvars.copy_context().run, search_solr, q, k) for q in qs]
+    out = []
+    for q, fut in zip(qs, futures):
+        try:
+            out.append({"query": q, "results": fut.result()})
+        except HTTPException as e:
+            out.append({"query": q, "results": [], "error": e.detail})
+    return out
+
+
+@app.post("/query_solr")
+def query_solr(request: QueryRequest):
     q = (request.query or "").strip()
-    k = max(1, min(request.top_k, TOPK_MAX))
+    k = clamp_k(request.top_k)
+    return {"engine": "solr", "query": q, "results": hydrate_hits(search_solr(q, k), q, request.snippet_chars)}
+
+
+@app.post("/query_solr_batch")
+def query_solr_batch(request: BatchQueryRequest):
+    qs = check_batch(request.queries)
+    k = clamp_k(request.top_k)
+    out = search_solr_batch(qs, k)
+    for item in out:
+        hydrate_hits(item["results"], item["query"], request.snippet_chars)
+    return {"engine": "solr", "results": out}
+
+
+# === Endpoint 2: RAG–Milvus ===
+def search_milvus(qs: List[str], k: int) -> List[List[Dict[str, Any]]]:
+    """Rama vectorial según VECTOR_ENGINE; devuelve los hits de cada consulta en orden."""
+    if VECTOR_ENGINE == "none":
+        raise HTTPException(status_code=503, detail="Rama vectorial desactivada en esta instancia (VECTOR_ENGINE=none)")
+    if VECTOR_ENGINE == "local":
+        return search_vector_local(qs, k)
+    if VECTOR_ENGINE == "fallback":
+        # Sin colección cargada no se espera a los reintentos de conexión: el refresco la recupera
+        if not _collections.status()["loaded"]:
+            BACKEND_FALLBACKS.inc(backend="milvus")
+            return search_vector_local(qs, k)
+        try:
+            return search_milvus_remote(qs, k)
+        except HTTPException as e:
+            print(f"⚠️ Milvus no disponible, se usa el índice local ({e.detail})")
+            BACKEND_FALLBACKS.inc(backend="milvus")
+            return search_vector_local(qs, k)
+    return search_milvus_remote(qs, k)
+
+
+def search_vector_local(qs: List[str], k: int) -> List[List[Dict[str, Any]]]:
+    """Top-k exacto en proceso (vector_engine.LocalVectorIndex) con el mismo formato que Milvus."""
     try:
-        model = get_model()
-        qvec = model.encode([q], normalize_embeddings=True).tolist()
-        col = get_collection()
+        _vector_local.observe_generation(_index_gen.key(("milvus",)))
+        qvec = encode_queries(qs)
+        with stage("vector_local"):
+            return _vector_local.get().hits(qvec, k)
+    except TimeoutError:
+        raise
+    except Exception as e:
+        BACKEND_ERRORS.inc(backend="vector_local")
+        raise HTTPException(status_code=502, detail=f"Vector local error: {e}")
 
-        # Asegurar que la colección esté cargada correctamente
-        if utility.has_collection(col.name):
-            col.load()
-            print(f"✅ Colección {col.name} cargada en memoria.")
-        else:
-            raise HTTPException(status_code=500, detail=f"⚠️ Colección {col.name} no existe en Milvus.")
-
-        results = col.search(
-            data=qvec,
-            anns_field=EMBED_FIELD,
-            param={"metric_type": "COSINE", "params": {"nprobe": 10}},
-            limit=k,
-            output_fields=["id", "section_title", "text_raw"]
-        )
+
+def search_milvus_remote(qs: List[str], k: int) -> List[List[Dict[str, Any]]]:
+    """Una sola búsqueda con nq = len(qs); devuelve los hits de cada consulta en orden."""
+    try:
+        qvec = encode_queries(qs)
+        col = get_collection()
+    except TimeoutError:
+        raise
     except Exception as e:
+        BACKEND_ERRORS.inc(backend="milvus")
+        raise HTTPException(status_code=502, detail=f"Milvus error: {e}")
+    remaining = leg_remaining()
+    try:
+        with stage("milvus"):
+            results = col.search(
+                data=qvec,
+                anns_field=EMBED_FIELD,
+                param={"metric_type": "COSINE", "params": {"nprobe": 10}},
+                limit=k,
+                output_fields=list(LEG_FIELDS),
+                timeout=None if remaining is None else max(0.001, remaining),
+            )
+    except Exception as e:
+        # La próxima petición vuelve a comprobar/cargar la colección (salvo si solo se agotó el plazo)
+        if remaining is None or leg_remaining() > 0:
+            _collections.invalidate()
+        BACKEND_ERRORS.inc(backend="milvus")
         raise HTTPException(status_code=502, detail=f"Milvus error: {e}")
 
-    hits = [{
+    return [[{
         "id": r.entity.get("id"),
-        "section_title": r.entity.get("section_title"),
-        "text_raw": r.entity.get("text_raw"),
         "score": float(r.distance),
         "engine": "milvus",
         "norm_score": float(r.distance),
-    } for r in results[0]]
-    return {"engine": "milvus", "query": q, "results": hits}
+    } for r in hits] for hits in results]
+
+
+@app.post("/query_milvus")
+def query_milvus(request: QueryRequest):
+    q = (request.query or "").strip()
+    k = clamp_k(request.top_k)
+    return {"engine": "milvus", "query": q, "results": hydrate_hits(search_milvus([q], k)[0], q, request.snippet_chars)}
+
+
+@app.post("/query_milvus_batch")
+def query_milvus_batch(request: BatchQueryRequest):
+    qs = check_batch(request.queries)
+    k = clamp_k(request.top_k)
+    if not qs:
+        return {"engine": "milvus", "results": []}
+    hits = search_milvus(qs, k)
+    return {"engine": "milvus", "results": [{"query": q, "results": hydrate_hits(h, q, request.snippet_chars)}
+                                            for q, h in zip(qs, hits)]}
+
+
+# === Fusión ===
+LEG_NAMES = ("solr", "milvus")  # claves válidas de weights
+
+
+def fusion_params(req) -> Tuple[str, float, Tuple[Tuple[str, float], ...]]:
+    """(método, K de RRF, pesos) de la petición; forma parte de la clave de la caché de respuestas."""
+    method = (req.fusion or FUSION_METHOD).lower()
+    rrf_k = FUSION_RRF_K if req.rrf_k is None else float(req.rrf_k)
+    if method not in FUSION_METHODS:
+        raise HTTPException(status_code=400, detail=f"fusión desconocida: {method} (opciones: {', '.join(FUSION_METHODS)})")
+    if rrf_k < 0:
+        raise HTTPException(status_code=400, detail="rrf_k debe ser >= 0")
+    weights = req.weights or {}
+    unknown = sorted(set(weights) - set(LEG_NAMES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"rama desconocida en weights: {', '.join(unknown)} (opciones: {', '.join(LEG_NAMES)})")
+    negative = sorted(n for n, w in weights.items() if w < 0)
+    if negative:
+        raise HTTPException(status_code=400, detail=f"los pesos deben ser >= 0 ({', '.join(negative)})")
+    return method, rrf_k, tuple(sorted(weights.items()))
+
+
+def backend_params(req) -> Tuple[str, Optional[Tuple[str, float, Tuple[Tuple[str, float], ...]]]]:
+    """(backend, parámetros de fusión) comunes a /ask, /ask_stream y /ask_batch.
+
+    400 con un backend desconocido; sin rama vectorial "both" pasa a "solr". Los parámetros de
+    fusión solo se leen (y validan) cuando hay fusión; si no, None."""
+    backend = (req.backend or "both").lower()
+    if backend not in ("solr", "milvus", "both"):
+        raise HTTPException(status_code=400, detail=f"backend desconocido: {backend} (opciones: solr, milvus, both)")
+    if backend == "both" and VECTOR_ENGINE == "none":
+        backend = "solr"
+    return backend, fusion_params(req) if backend == "both" else None
 
 
-# === Fusión RRF ===
-def rrf_merge(solr_docs: List[Dict[str, Any]], milvus_docs: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
-    K = 60.0
-    ranks: Dict[str, Dict[str, Any]] = {}
+def merge_legs(lists: Dict[str, List[Dict[str, Any]]], k: int, params) -> List[Dict[str, Any]]:
+    method, rrf_k, weights = params
+    with stage("fusion"):
+        return fuse(lists, k, method=method, rrf_k=rrf_k, weights=dict(weights))
 
-    for i, d in enumerate(solr_docs):
-        rid = d["id"]
-        ranks.setdefault(rid, {"obj": d, "rrf": 0.0})
-        ranks[rid]["rrf"] += 1.0 / (K + i + 1)
 
-    for i, d in enumerate(milvus_docs):
-        rid = d["id"]
-        if rid in ranks:
-            ranks[rid]["obj"].setdefault("text_raw", d.get("text_raw"))
-            ranks[rid]["obj"].setdefault("section_title", d.get("section_title"))
-        else:
-            ranks[rid] = {"obj": d, "rrf": 0.0}
-        ranks[rid]["rrf"] += 1.0 / (K + i + 1)
+def hydrate_hits(docs: List[Dict[str, Any]], q: str, snippet_chars: Optional[int]) -> List[Dict[str, Any]]:
+    """Lee del corpus local los textos del top-k final (las ramas solo traen id + score)."""
+    with stage("hydrate"):
+        try:
+            return hydrate(docs, q, snippet_chars)
+        except CorpusUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
 
-    out = [dict(obj, rrf_score=pack["rrf"]) for _, pack in ranks.items()]
-    out.sort(key=lambda x: x["rrf_score"], reverse=True)
-    return out[:k]
+# === Ejecución concurrente de ramas ===
+def _leg_outcome(name: str, fut) -> Tuple[List[Dict[str, Any]], str]:
+    try:
+        return fut.result(), "ok"
+    except HTTPException as e:
+        return [], f"error: {e.detail}"
+    except TimeoutError:
+        # La rama cortó su propia espera (p. ej. al micro-batcher) al agotar el plazo
+        BACKEND_TIMEOUTS.inc(backend=name)
+        return [], "timeout"
+    except Exception as e:
+        BACKEND_ERRORS.inc(backend=name)
+        return [], f"error: {e}"
+
+
+def _run_leg(deadline: float, fn: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    _leg_deadline.set(deadline)
+    if time.monotonic() >= deadline:
+        # Esperó en la cola del pool más que su plazo: no se lanza la búsqueda
+        raise HTTPException(status_code=504, detail="plazo agotado antes de empezar")
+    return fn()
+
+
+def iter_legs(legs: Dict[str, Tuple[Callable[[], List[Dict[str, Any]]], float]]) -> Iterator[Tuple[str, List[Dict[str, Any]], str]]:
+    """Lanza cada rama en el pool y produce (name, resultados, estado) según van terminando.
+
+    Cada rama tiene su plazo contado desde el inicio; estado es "ok", "timeout" o "error: ...".
+    """
+    start = time.monotonic()
+    futures = {_leg_pool.submit(contextvars.copy_context().run, _run_leg, start + deadline, fn): name
+               for name, (fn, deadline) in legs.items()}
+    pending = set(futures)
+    while pending:
+        elapsed = time.monotonic() - start
+        for fut in [f for f in pending if not f.done() and legs[futures[f]][1] <= elapsed]:
+            pending.discard(fut)
+            fut.cancel()
+            BACKEND_TIMEOUTS.inc(backend=futures[fut])
+            yield futures[fut], [], "timeout"
+        if not pending:
+            break
+        timeout = max(0.0, min(legs[futures[f]][1] for f in pending) - elapsed)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for fut in done:
+            pending.discard(fut)
+            yield (futures[fut],) + _leg_outcome(futures[fut], fut)
+
+
+def run_legs(legs: Dict[str, Tuple[Callable[[], List[Dict[str, Any]]], float]]):
+    """Espera a todas las ramas (o a su plazo). Devuelve (resultados, estado) en el orden de legs."""
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    status: Dict[str, str] = {}
+    for name, res, st in iter_legs(legs):
+        results[name], status[name] = res, st
+    return {n: results[n] for n in legs}, {n: status[n] for n in legs}
 
 
 # === Endpoint 3: Unified ASK ===
+def ask_setup(req: AskRequest):
+    """(consulta, k, backend, parámetros de fusión, clave de caché) comunes a /ask y /ask_stream."""
+    q = (req.query or "").strip()
+    k = clamp_k(req.top_k)
+    backend, params = backend_params(req)
+    _result_cache.observe_generation(_index_gen.key(("solr", "milvus")))
+    # La generación leída antes de buscar va en la clave: si hay un reindexado en vuelo,
+    # la respuesta antigua se guarda bajo una clave que ya nadie vuelve a pedir
+    gen = _index_gen.key(("solr", "milvus") if backend == "both" else (backend,))
+    return q, k, backend, params, (backend, normalize_query(q), k, params, req.snippet_chars, gen)
+
+
 @app.post("/ask")
 def ask(req: AskRequest):
-    q = (req.query or "").strip()
-    k = max(1, min(req.top_k, TOPK_MAX))
-    backend = (req.backend or "both").lower()
+    q, k, backend, params, cache_key = ask_setup(req)
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-    sols, mils = [], []
+    if backend == "solr":
+        resp = {"backend": "solr", "query": q, "results": hydrate_hits(search_solr(q, k), q, req.snippet_chars)}
+    elif backend == "milvus":
+        resp = {"backend": "milvus", "query": q, "results": hydrate_hits(search_milvus([q], k)[0], q, req.snippet_chars)}
+    else:
+        results, status = run_legs({
+            "solr": (lambda: search_solr(q, k), SOLR_DEADLINE_S),
+            "milvus": (lambda: search_milvus([q], k)[0], MILVUS_DEADLINE_S),
+        })
+        if not any(v == "ok" for v in status.values()):
+            raise HTTPException(status_code=502, detail={"backends": status})
+        merged = hydrate_hits(merge_legs(results, k, params), q, req.snippet_chars)
+        resp = {"backend": "both", "query": q, "results": merged, "backends": status, "fusion": params[0]}
+        # Las respuestas parciales (una rama caída) no se cachean
+        if any(v != "ok" for v in status.values()):
+            return resp
+
+    _result_cache.put(cache_key, resp)
+    return resp
+
+
+@app.post("/ask_stream")
+def ask_stream(req: AskRequest, request: Request):
+    """Como /ask, pero emite un evento por rama en cuanto termina y al final el ranking fusionado.
+
+    NDJSON por defecto; Server-Sent Events si el cliente envía Accept: text/event-stream.
+    Eventos: {"event": "leg", "backend", "status", "results"} y después
+    {"event": "final", ...respuesta de /ask} o {"event": "error", "backends"} si fallan todas.
+    Un error posterior a las cabeceras (p. ej. corpus no disponible al hidratar) llega como
+    {"event": "error", "status", "detail"}.
+    """
+    q, k, backend, params, cache_key = ask_setup(req)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    def encode(obj: Dict[str, Any]) -> str:
+        data = json.dumps(obj, ensure_ascii=False)
+        return f"event: {obj['event']}\ndata: {data}\n\n" if sse else data + "\n"
+
+    def events() -> Iterator[str]:
+        try:
+            yield from leg_events()
+        except HTTPException as e:
+            yield encode({"event": "error", "status": e.status_code, "detail": e.detail})
+
+    def leg_events() -> Iterator[str]:
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            yield encode({"event": "final", **cached})
+            return
+        legs = {}
+        if backend in ("solr", "both"):
+            legs["solr"] = (lambda: search_solr(q, k), SOLR_DEADLINE_S)
+        if backend in ("milvus", "both"):
+            legs["milvus"] = (lambda: search_milvus([q], k)[0], MILVUS_DEADLINE_S)
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        status: Dict[str, str] = {}
+        for name, res, st in iter_legs(legs):
+            results[name], status[name] = res, st
+            # Copias: la fusión parte de las listas sin hidratar
+            hits = hydrate_hits([dict(d) for d in res], q, req.snippet_chars)
+            yield encode({"event": "leg", "backend": name, "status": st, "results": hits})
+        status = {n: status[n] for n in legs}
+        if not any(v == "ok" for v in status.values()):
+            yield encode({"event": "error", "backends": status})
+            return
+        if backend == "both":
+            merged = hydrate_hits(merge_legs(results, k, params), q, req.snippet_chars)
+            resp = {"backend": "both", "query": q, "results": merged, "backends": status, "fusion": params[0]}
+        else:
+            resp = {"backend": backend, "query": q, "results": hydrate_hits(results[backend], q, req.snippet_chars)}
+        yield encode({"event": "final", **resp})
+        # Mismo criterio que /ask: solo se cachean respuestas completas
+        if all(v == "ok" for v in status.values()):
+            _result_cache.put(cache_key, resp)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/ask_batch")
+def ask_batch(req: AskBatchRequest):
+    qs = check_batch(req.queries)
+    k = clamp_k(req.top_k)
+    backend, params = backend_params(req)
+    if not qs:
+        return {"backend": backend, "results": []}
+
+    solr_errors: Dict[int, str] = {}
+
+    def solr_leg() -> List[List[Dict[str, Any]]]:
+        items = search_solr_batch(qs, k)
+        solr_errors.update((i, item["error"]) for i, item in enumerate(items) if "error" in item)
+        if len(solr_errors) == len(items):
+            raise HTTPException(status_code=502, detail=f"Solr falló en todas las consultas ({items[0]['error']})")
+        return [item["results"] for item in items]
+
+    legs = {}
     if backend in ("solr", "both"):
-        sols = query_solr(QueryRequest(query=q, top_k=k))["results"]
+        legs["solr"] = (solr_leg, SOLR_DEADLINE_S)
     if backend in ("milvus", "both"):
-        mils = query_milvus(QueryRequest(query=q, top_k=k))["results"]
-
+        legs["milvus"] = (lambda: search_milvus(qs, k), MILVUS_DEADLINE_S)
+    results, status = run_legs(legs)
+    if not any(v == "ok" for v in status.values()):
+        raise HTTPException(status_code=502, detail={"backends": status})
+    # Con timeout la rama puede seguir escribiendo en solr_errors: se ignora
+    failed = dict(solr_errors) if status.get("solr") != "timeout" else {}
+    if status.get("solr") == "ok" and failed:
+        # Fallo parcial: la rama respondió, pero no para todas las consultas
+        status["solr"] = f"error: {len(failed)}/{len(qs)} consultas fallidas"
+
+    empty = [[] for _ in qs]
+    sols = results.get("solr") or empty
+    mils = results.get("milvus") or empty
     if backend == "solr":
-        return {"backend": "solr", "query": q, "results": sols}
-    if backend == "milvus":
-        return {"backend": "milvus", "query": q, "results": mils}
-
-    merged = rrf_merge(sols, mils, k)
-    return {"backend": "both", "query": q, "results": merged}
+        per_query = sols
+    elif backend == "milvus":
+        per_query = mils
+    else:
+        per_query = [merge_legs({"solr": s_, "milvus": m_}, k, params) for s_, m_ in zip(sols, mils)]
+    items = []
+    for i, (q, r) in enumerate(zip(qs, per_query)):
+        item = {"query": q, "results": hydrate_hits(r, q, req.snippet_chars)}
+        if i in failed:
+            item["error"] = failed[i]  # como en /query_solr_batch
+        items.append(item)
+    return {"backend": backend, "results": items, "backends": status}
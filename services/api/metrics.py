@@ -0,0 +1,153 @@
+# services/api/metrics.py
+# Métricas en memoria con salida en formato de texto de Prometheus, sin dependencias externas.
+# stage("embed") mide una etapa: alimenta el histograma rag_stage_seconds y el desglose de la
+# petición en curso (cabecera Server-Timing).
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_fmt_labels(k)} {_num(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [conteos por bucket (no acumulados) + desbordamiento, suma, total]
+        self._values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            v = self._values.get(key)
+            if v is None:
+                v = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            v[0][i] += 1
+            v[1] += value
+            v[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, n) in items:
+            acc = 0
+            for le, c in zip(self.buckets, counts):
+                acc += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', f'{le:g}'))} {acc}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {n}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {n}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("rag_request_seconds", "Latencia total por endpoint")
+STAGE_SECONDS   = Histogram("rag_stage_seconds", "Latencia por etapa (embed, solr, milvus, fusion, ...)")
+REQUESTS_TOTAL  = Counter("rag_requests_total", "Peticiones por endpoint y código HTTP")
+BACKEND_ERRORS  = Counter("rag_backend_errors_total", "Errores por backend")
+BACKEND_TIMEOUTS  = Counter("rag_backend_timeouts_total", "Ramas de /ask que agotaron su plazo, por backend")
+BACKEND_FALLBACKS = Counter("rag_backend_fallbacks_total", "Búsquedas servidas por el motor local de respaldo")
+
+_METRICS = [REQUEST_SECONDS, STAGE_SECONDS, REQUESTS_TOTAL, BACKEND_ERRORS, BACKEND_TIMEOUTS, BACKEND_FALLBACKS]
+# Gauges calculados al exportar: nombre -> (ayuda, función que devuelve {labels: valor})
+_GAUGES: Dict[str, Tuple[str, Callable[[], Dict[Labels, float]]]] = {}
+
+# Desglose por etapa de la petición en curso: {etapa: [segundos acumulados, veces]}
+_request_stages: contextvars.ContextVar[Optional[Dict[str, list]]] = contextvars.ContextVar("request_stages", default=None)
+
+
+def register_gauge(name: str, help_text: str, fn: Callable[[], Dict[Labels, float]]) -> None:
+    _GAUGES[name] = (help_text, fn)
+
+
+def begin_request() -> Tuple[Dict[str, list], contextvars.Token]:
+    stages: Dict[str, list] = {}
+    return stages, _request_stages.set(stages)
+
+
+def end_request(token: contextvars.Token) -> None:
+    _request_stages.reset(token)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name)
+    stages = _request_stages.get()
+    if stages is not None:
+        acc = stages.setdefault(name, [0.0, 0])
+        acc[0] += seconds
+        acc[1] += 1
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t)
+
+
+def server_timing(stages: Dict[str, list], total_s: Optional[float] = None) -> str:
+    """Cabecera Server-Timing; las etapas repetidas (p. ej. fan-out) suman su duración."""
+    parts = [f"{name};dur={secs * 1000:.2f}" + (f';desc="x{n}"' if n > 1 else "")
+             for name, (secs, n) in stages.items()]
+    if total_s is not None:
+        parts.append(f"total;dur={total_s * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _METRICS:
+        lines += m.render()
+    for name, (help_text, fn) in _GAUGES.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        try:
+            lines += [f"{name}{_fmt_labels(k)} {_num(v)}" for k, v in fn().items()]
+        except Exception:
+            pass
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,42 @@
+# services/api/model_backend.py (copiado en services/indexer/; ver scripts/check_shared_modules.py)
+# Carga del SentenceTransformer con backend de inferencia seleccionable por EMBED_BACKEND.
+#   torch      PyTorch fp32 (por defecto)
+#   int8       PyTorch con cuantización dinámica int8 de las capas Linear
+#   onnx       grafo ONNX exportado (onnxruntime)
+#   onnx-int8  grafo ONNX cuantizado int8 (ONNX_INT8_FILE dentro del repo del modelo)
+# En todos los casos encode(..., normalize_embeddings=True) mantiene el mismo contrato.
+import os
+
+EMBED_BACKEND  = os.getenv("EMBED_BACKEND", "torch").lower()
+# Nombres de export_dynamic_quantized_onnx_model: model_quint8_avx2 (x86 genérico),
+# model_qint8_avx512 / model_qint8_avx512_vnni / model_qint8_arm64 según la CPU
+ONNX_INT8_FILE = os.getenv("ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+
+
+def model_id(model_name: str, backend: str = EMBED_BACKEND) -> str:
+    """Identificador para claves de caché: los vectores de backends distintos no son idénticos."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def load_sentence_model(model_name: str, backend: str = EMBED_BACKEND, fallback: bool = True):
+    """Devuelve (modelo, backend efectivo); con fallback=True un backend no disponible cae a torch."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"EMBED_BACKEND desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    try:
+        if backend == "torch":
+            return SentenceTransformer(model_name, device="cpu"), backend
+        if backend == "int8":
+            import torch
+            model = SentenceTransformer(model_name, device="cpu")
+            torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            return model, backend
+        kwargs = {"model_kwargs": {"file_name": ONNX_INT8_FILE}} if backend == "onnx-int8" else {}
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", **kwargs), backend
+    except Exception as e:
+        if not fallback or backend == "torch":
+            raise
+        print(f"⚠️ Backend {backend} no disponible ({e}); se usa torch fp32")
+        return SentenceTransformer(model_name, device="cpu"), "torch"
@@ -0,0 +1,107 @@
+# services/api/result_cache.py
+# Caché de respuestas de /ask invalidada por la generación del índice que publican los indexadores.
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class IndexGeneration:
+    """Lee index_generation.json como mucho una vez cada `check_s` (y solo si cambió su mtime)."""
+
+    def __init__(self, path: str, check_s: float = 2.0):
+        self.path = path
+        self.check_s = float(check_s)
+        self._mtime = None
+        self._gen: Dict[str, int] = {}
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Dict[str, int]:
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._gen
+        with self._lock:
+            self._next_check = now + self.check_s
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return self._gen
+            if mtime != self._mtime:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        data = json.load(f)
+                    self._gen = {k: int(v) for k, v in data.items() if k in ("solr", "milvus")}
+                    self._mtime = mtime
+                except (OSError, ValueError):
+                    pass
+        return self._gen
+
+    def key(self, backends: Tuple[str, ...]) -> Tuple[int, ...]:
+        gen = self.current()
+        return tuple(gen.get(b, 0) for b in backends)
+
+
+class ResultCache:
+    """LRU de respuestas acotado por número de entradas.
+
+    observe_generation() vacía la caché al cambiar la generación, pero no cubre una búsqueda que
+    empezó antes del cambio y guarda después: quien llama debe incluir en la clave la generación
+    leída antes de buscar (IndexGeneration.key)."""
+
+    def __init__(self, max_items: int = 2048):
+        self.max_items = max(0, int(max_items))
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_gen: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def observe_generation(self, gen: Hashable) -> None:
+        """Vacía la caché al detectar una generación nueva (libera memoria de entradas inalcanzables)."""
+        if gen == self._last_gen:
+            return
+        with self._lock:
+            if gen != self._last_gen:
+                if self._last_gen is not None and self._data:
+                    self.invalidations += 1
+                self._data.clear()
+                self._last_gen = gen
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_items == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_items": self.max_items,
+                "generation": self._last_gen,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+            }
@@ -0,0 +1,118 @@
+# services/api/vector_engine.py
+# Motor vectorial en proceso: búsqueda exacta (fuerza bruta) por coseno con NumPy.
+# Lee los vectores que deja el indexador en EMBED_STORE_DIR/<modelo>/ (vectors.f32 + index.tsv
+# + sections.json) y los textos del corpus vía corpus_store; no necesita Milvus.
+import json
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from corpus_store import CorpusStore, get_corpus_store
+
+EMBED_STORE_DIR = Path(os.getenv("EMBED_STORE_DIR", "/app/data/embeddings"))
+CORPUS_PATH     = Path(os.getenv("CORPUS_PATH", "/app/data/corpus/books_preprocessed_MWE.jsonl"))
+# 1 = matriz memmap sobre vectors.f32 (sin copia en RAM); 0 = copia contigua compactada
+VECTOR_MMAP     = os.getenv("VECTOR_MMAP", "0") == "1"
+
+
+def model_slug(model_name: str) -> str:
+    # Igual que services/indexer/embedding_store.py
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+class LocalVectorIndex:
+    """Top-k exacto por producto interno sobre vectores normalizados (= coseno).
+
+    `ids[i]` es el section_id de la fila i de `matrix`. En modo memmap la matriz es el fichero
+    del almacén tal cual y las filas obsoletas (textos que ya no están en el corpus) se enmascaran
+    con `valid`; en modo RAM se compactan y se renormalizan.
+    """
+
+    def __init__(self, ids: List[Optional[str]], matrix: np.ndarray, corpus: CorpusStore):
+        self.ids = ids
+        self.matrix = matrix
+        self.corpus = corpus
+        self.valid = np.array([sid is not None for sid in ids], dtype=bool)
+        self.masked = not bool(self.valid.all())
+
+    @property
+    def size(self) -> int:
+        return int(self.valid.sum())
+
+    @classmethod
+    def from_store(cls, model_names: List[str], root: Path = EMBED_STORE_DIR,
+                   corpus_path: Path = CORPUS_PATH, mmap: bool = VECTOR_MMAP) -> "LocalVectorIndex":
+        """Abre el primer almacén existente de `model_names` (p. ej. modelo@backend y luego el fp32)."""
+        store = next((Path(root) / model_slug(m) for m in model_names
+                      if (Path(root) / model_slug(m) / "meta.json").exists()), None)
+        if store is None:
+            raise FileNotFoundError(f"No hay almacén de embeddings para {model_names} en {root}")
+        meta = json.loads((store / "meta.json").read_text(encoding="utf-8"))
+        dim = int(meta["dim"])
+        sections = json.loads((store / "sections.json").read_text(encoding="utf-8"))
+        rows: Dict[str, int] = {}
+        with open(store / "index.tsv", encoding="utf-8") as f:
+            for line in f:
+                h, _, row = line.rstrip("\n").partition("\t")
+                if h:
+                    rows[h] = int(row)
+        n = min(len(rows), (store / "vectors.f32").stat().st_size // (4 * dim))
+        corpus = get_corpus_store(corpus_path)
+        # Solo secciones presentes en el corpus actual y con vector en el almacén
+        pairs = [(sid, rows[h]) for sid, h in sections.items() if sid in corpus and rows.get(h, n) < n]
+        mm = np.memmap(store / "vectors.f32", dtype=np.float32, mode="r", shape=(n, dim)) if n else np.zeros((0, dim), np.float32)
+        if mmap:
+            # Los vectores del indexador ya salen normalizados
+            ids: List[Optional[str]] = [None] * n
+            for sid, row in pairs:
+                ids[row] = sid
+            return cls(ids, mm, corpus)
+        mat = np.ascontiguousarray(mm[[row for _, row in pairs]], dtype=np.float32) if pairs else np.zeros((0, dim), np.float32)
+        return cls([sid for sid, _ in pairs], _normalize(mat), corpus)
+
+    @classmethod
+    def from_corpus(cls, encode_fn: Callable[[List[str]], np.ndarray],
+                    corpus_path: Path = CORPUS_PATH, batch_size: int = 64) -> "LocalVectorIndex":
+        """Codifica el corpus en proceso (sin almacén previo); lento, pensado para pruebas."""
+        corpus = get_corpus_store(corpus_path)
+        ids = corpus.ids()
+        texts = [(d.get("text_raw") or d.get("section_title") or "") for d in corpus.get_many(ids)]
+        parts = [np.asarray(encode_fn(texts[i:i + batch_size]), dtype=np.float32)
+                 for i in range(0, len(texts), batch_size)]
+        mat = np.vstack(parts) if parts else np.zeros((0, 0), np.float32)
+        return cls(ids, np.ascontiguousarray(_normalize(mat)), corpus)
+
+    def search(self, qvecs: np.ndarray, k: int) -> List[List[Tuple[str, float]]]:
+        """Para cada consulta, [(section_id, coseno)] ordenado de mayor a menor."""
+        q = _normalize(np.atleast_2d(np.asarray(qvecs, dtype=np.float32)))
+        n = self.matrix.shape[0]
+        if n == 0 or self.size == 0:
+            return [[] for _ in range(q.shape[0])]
+        scores = q @ self.matrix.T  # (nq, n)
+        if self.masked:
+            scores[:, ~self.valid] = -np.inf
+        k = min(k, self.size)
+        if k < n:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n), (q.shape[0], n))
+        out = []
+        for qi in range(q.shape[0]):
+            cand = top[qi]
+            order = cand[np.argsort(-scores[qi, cand], kind="stable")]
+            out.append([(self.ids[j], float(scores[qi, j])) for j in order])
+        return out
+
+    def hits(self, qvecs: np.ndarray, k: int, engine: str = "local_vector") -> List[List[Dict]]:
+        """Mismo formato que los hits de Milvus en main.search_milvus: solo id y score."""
+        return [[{"id": sid, "score": score, "engine": engine, "norm_score": score} for sid, score in res]
+                for res in self.search(qvecs, k)]
@@ -0,0 +1,85 @@
+# services/api/warmup.py
+# Calentamiento en el arranque: cada componente (modelo, Solr, Milvus, índices locales) se prepara
+# en su propio hilo, en paralelo, reintentando si falla. /ready expone el estado por componente.
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class Component:
+    def __init__(self, name: str, warm: Callable[[], None], required: bool = True,
+                 check: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.warm = warm
+        self.required = required  # False: hay respaldo local, no bloquea la disponibilidad
+        self.check = check        # comprobación en vivo tras el calentamiento (sin E/S)
+        self.state = "pending"    # pending | warming | ready | failed
+        self.attempts = 0
+        self.warm_s = 0.0
+        self.error: Optional[str] = None
+
+    def ready(self) -> bool:
+        if self.state != "ready":
+            return False
+        try:
+            return self.check is None or bool(self.check())
+        except Exception:
+            return False
+
+    def status(self) -> Dict[str, object]:
+        return {"ready": self.ready(), "state": self.state, "required": self.required,
+                "attempts": self.attempts, "warm_s": round(self.warm_s, 3), "error": self.error}
+
+
+class Readiness:
+    """Lanza el calentamiento de todos los componentes a la vez; los que fallan se reintentan
+    cada retry_s hasta que funcionan o se llama a stop()."""
+
+    def __init__(self, retry_s: float = 3.0):
+        self.retry_s = float(retry_s)
+        self.components: Dict[str, Component] = {}
+        self._stop = threading.Event()
+        self.started_at: Optional[float] = None
+
+    def add(self, name: str, warm: Callable[[], None], required: bool = True,
+            check: Optional[Callable[[], bool]] = None) -> None:
+        self.components[name] = Component(name, warm, required, check)
+
+    def start(self) -> None:
+        self.started_at = time.time()
+        for c in self.components.values():
+            threading.Thread(target=self._run, args=(c,), name=f"warmup-{c.name}", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def wait(self, timeout: float) -> bool:
+        """Espera hasta timeout segundos a que estén listos los componentes obligatorios."""
+        deadline = time.monotonic() + timeout
+        while not self.ready() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.ready()
+
+    def ready(self) -> bool:
+        return all(c.ready() for c in self.components.values() if c.required)
+
+    def status(self) -> Dict[str, object]:
+        return {"ready": self.ready(), "components": {n: c.status() for n, c in self.components.items()}}
+
+    def _run(self, c: Component) -> None:
+        while not self._stop.is_set():
+            c.state = "warming"
+            c.attempts += 1
+            t = time.perf_counter()
+            try:
+                c.warm()
+            except Exception as e:
+                c.state, c.error = "failed", str(e)[:300]
+                if c.attempts == 1 or c.attempts % 10 == 0:  # un componente opcional puede no volver nunca
+                    print(f"⏳ Warm-up de {c.name}: intento {c.attempts} falló ({e})")
+                self._stop.wait(self.retry_s)
+                continue
+            c.warm_s = time.perf_counter() - t
+            c.state, c.error = "ready", None
+            print(f"🔥 {c.name} listo ({c.warm_s:.2f}s)")
+            return
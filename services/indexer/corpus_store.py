@@ -0,0 +1,150 @@
+# services/indexer/corpus_store.py (copia de services/api/corpus_store.py; ver scripts/check_shared_modules.py)
+# Acceso compartido al corpus JSONL: índice de offsets en disco (section_id -> byte inicial y
+# longitud de la línea) construido una sola vez y lectura perezosa O(1) vía mmap.
+#
+# El índice se guarda junto al corpus como <corpus>.idx ("section_id\toffset\tlength" por línea,
+# con una cabecera con tamaño y mtime del corpus); si el corpus cambia se reconstruye.
+import json
+import mmap
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+CORPUS_PATH = Path(os.getenv("CORPUS_PATH", "/app/data/corpus/books_preprocessed_MWE.jsonl"))
+
+_SID_RE = re.compile(rb'"section_id"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _section_id(line: bytes) -> Optional[str]:
+    m = _SID_RE.search(line)
+    if m and b"\\" not in m.group(1):
+        return m.group(1).decode("utf-8")
+    # Escapes u otro formato: se delega en json
+    try:
+        sid = json.loads(line).get("section_id")
+    except ValueError:
+        return None
+    return str(sid) if sid else None
+
+
+class CorpusStore:
+    """get(section_id) -> {"section_id", "section_title", "text_raw", "lemmas", ...} sin cargar el corpus."""
+
+    def __init__(self, path: Path = CORPUS_PATH, index_path: Optional[Path] = None):
+        self.path = Path(path)
+        self.index_path = Path(index_path) if index_path else self.path.with_name(self.path.name + ".idx")
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._order: List[str] = []
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+        self.signature = self._signature()
+        self._load_or_build()
+
+    # --- índice ---
+    def _signature(self) -> str:
+        st = self.path.stat()
+        return f"#corpus\t{st.st_size}\t{st.st_mtime_ns}"
+
+    def stale(self) -> bool:
+        """True si el corpus cambió en disco desde que se construyó el índice."""
+        try:
+            return self._signature() != self.signature
+        except OSError:
+            return True
+
+    def _load_or_build(self) -> None:
+        sig = self.signature
+        if self.index_path.exists():
+            with open(self.index_path, encoding="utf-8") as f:
+                if f.readline().rstrip("\n") == sig:
+                    for line in f:
+                        sid, off, length = line.rstrip("\n").split("\t")
+                        self._offsets[sid] = (int(off), int(length))
+                        self._order.append(sid)
+                    return
+        self._build(sig)
+
+    def _build(self, sig: str) -> None:
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                sid = _section_id(line) if line.strip() else None
+                if sid is not None:
+                    if sid not in self._offsets:
+                        self._order.append(sid)
+                    # Como al indexar, si un section_id se repite gana la última línea
+                    self._offsets[sid] = (offset, len(line))
+                offset += len(line)
+        try:
+            tmp = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(sig + "\n")
+                f.writelines(f"{sid}\t{o}\t{n}\n" for sid, (o, n) in ((s, self._offsets[s]) for s in self._order))
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            # Directorio de solo lectura: el índice queda solo en memoria
+            print(f"⚠️ No se pudo guardar el índice del corpus en {self.index_path} ({e})")
+
+    # --- lectura ---
+    def _view(self) -> mmap.mmap:
+        if self._mm is None:
+            with self._lock:
+                if self._mm is None:
+                    self._file = open(self.path, "rb")
+                    self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._offsets
+
+    def ids(self) -> List[str]:
+        return list(self._order)
+
+    def get(self, sid: str) -> Optional[dict]:
+        loc = self._offsets.get(sid)
+        if loc is None:
+            return None
+        off, length = loc
+        return json.loads(self._view()[off:off + length])
+
+    def get_many(self, sids: Iterable[str]) -> List[Optional[dict]]:
+        return [self.get(sid) for sid in sids]
+
+    def text(self, sid: str) -> str:
+        d = self.get(sid)
+        return (d.get("text_raw") or "") if d else ""
+
+    def iter_docs(self) -> Iterator[dict]:
+        """Recorre el corpus en orden de fichero (para indexadores y evaluaciones completas)."""
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+
+
+_stores: Dict[str, CorpusStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_corpus_store(path: Path = CORPUS_PATH) -> CorpusStore:
+    """Instancia única por ruta dentro del proceso; se reabre si el corpus cambió en disco."""
+    key = str(Path(path).resolve())
+    store = _stores.get(key)
+    if store is None or store.stale():
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None or store.stale():
+                store = _stores[key] = CorpusStore(path)
+    return store
@@ -0,0 +1,162 @@
+# services/indexer/embedding_store.py
+# Almacén persistente de embeddings: matriz float32 en disco (memmap) + índice hash -> fila.
+#
+# Estructura de EMBED_STORE_DIR/<modelo>/:
+#   vectors.f32    matriz (n, dim) float32 contigua, solo se añade al final
+#   index.tsv      "<sha1 del texto>\t<fila>" por línea
+#   sections.json  {section_id: sha1 del texto}, para cargar vectores por sección sin Milvus
+#   meta.json      {"model": ..., "dim": ..., "count": ...}
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+EMBED_STORE_DIR = Path(os.getenv("EMBED_STORE_DIR", "/app/data/embeddings"))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def model_slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+class EmbeddingStore:
+    def __init__(self, model_name: str, dim: int, root: Path = EMBED_STORE_DIR):
+        self.model_name = model_name
+        self.dim = int(dim)
+        self.dir = Path(root) / model_slug(model_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vec_path = self.dir / "vectors.f32"
+        self.index_path = self.dir / "index.tsv"
+        self.sections_path = self.dir / "sections.json"
+        self.meta_path = self.dir / "meta.json"
+        self._check_meta()
+        self.index: Dict[str, int] = self._read_index()
+        self._pending: List[Tuple[str, int]] = []
+        self._mm: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.index)
+
+    def matrix(self) -> np.ndarray:
+        """Vista memmap (solo lectura) de todos los vectores guardados."""
+        if self._mm is None or self._mm.shape[0] != self.count:
+            if self.count == 0:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            self._mm = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._mm
+
+    def get_many(self, hashes: List[str]) -> List[Optional[np.ndarray]]:
+        mat = self.matrix()
+        out = []
+        for h in hashes:
+            row = self.index.get(h)
+            if row is None:
+                self.misses += 1
+                out.append(None)
+            else:
+                self.hits += 1
+                out.append(np.array(mat[row]))
+        return out
+
+    def add_many(self, hashes: List[str], vecs: np.ndarray) -> None:
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32).reshape(-1, self.dim)
+        new: Dict[str, np.ndarray] = {}
+        for h, v in zip(hashes, vecs):
+            if h not in self.index and h not in new:  # un hash repetido ocupa una sola fila
+                new[h] = v
+        if not new:
+            return
+        # La siguiente fila libre es la del fichero, no len(self.index)
+        row = (self.vec_path.stat().st_size // (4 * self.dim)) if self.vec_path.exists() else 0
+        with open(self.vec_path, "ab") as f:
+            for h, v in new.items():
+                f.write(v.tobytes())
+                self.index[h] = row
+                self._pending.append((h, row))
+                row += 1
+
+    def encode_cached(self, texts: List[str], encode_fn) -> np.ndarray:
+        """Devuelve los vectores de `texts`, calculando con `encode_fn` solo los que faltan."""
+        hashes = [text_hash(t) for t in texts]
+        found = self.get_many(hashes)
+        # Textos repetidos en la misma llamada se codifican una sola vez
+        missing: Dict[str, List[int]] = {}
+        for i, v in enumerate(found):
+            if v is None:
+                missing.setdefault(hashes[i], []).append(i)
+        if missing:
+            first = [idx[0] for idx in missing.values()]
+            fresh = np.asarray(encode_fn([texts[i] for i in first]), dtype=np.float32)
+            self.add_many(list(missing), fresh)
+            for idx, v in zip(missing.values(), fresh):
+                for i in idx:
+                    found[i] = v
+        if not found:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack(found)
+
+    def save_sections(self, sections: Dict[str, str]) -> None:
+        self._atomic_write(self.sections_path, json.dumps(sections))
+
+    def flush(self) -> None:
+        if self._pending:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{h}\t{row}\n" for h, row in self._pending)
+            self._pending.clear()
+        self._atomic_write(self.meta_path, json.dumps({"model": self.model_name, "dim": self.dim, "count": self.count}))
+
+    def stats(self) -> Dict[str, int]:
+        return {"count": self.count, "hits": self.hits, "misses": self.misses}
+
+    def _check_meta(self) -> None:
+        if not self.meta_path.exists():
+            return
+        meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        if int(meta.get("dim", self.dim)) != self.dim:
+            raise ValueError(f"Dimensión del almacén ({meta.get('dim')}) distinta de {self.dim} en {self.dir}")
+
+    def _read_index(self) -> Dict[str, int]:
+        index: Dict[str, int] = {}
+        if self.index_path.exists():
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    h, _, row = line.rstrip("\n").partition("\t")
+                    if h:
+                        index[h] = int(row)
+        # Si el proceso murió entre escribir vectores e índice, las filas huérfanas se descartan
+        rows = (self.vec_path.stat().st_size // (4 * self.dim)) if self.vec_path.exists() else 0
+        if rows != len(index):
+            index = {h: r for h, r in index.items() if r < rows}
+            if self.vec_path.exists():
+                with open(self.vec_path, "r+b") as f:
+                    f.truncate(len(index) * 4 * self.dim)
+        return index
+
+    @staticmethod
+    def _atomic_write(path: Path, data: str) -> None:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(data, encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def load_vectors(model_name: str, section_ids: Optional[Iterable[str]] = None,
+                 root: Path = EMBED_STORE_DIR) -> Tuple[List[str], np.ndarray]:
+    """Carga (ids, matriz) desde el almacén sin tocar Milvus; pensado para herramientas offline."""
+    d = Path(root) / model_slug(model_name)
+    meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+    store = EmbeddingStore(model_name, meta["dim"], root)
+    sections = json.loads(store.sections_path.read_text(encoding="utf-8"))
+    wanted = list(section_ids) if section_ids is not None else list(sections)
+    ids = [sid for sid in wanted if sections.get(sid) in store.index]
+    rows = [store.index[sections[sid]] for sid in ids]
+    return ids, np.asarray(store.matrix()[rows], dtype=np.float32)
@@ -0,0 +1,149 @@
+# services/indexer/encoder.py
+# Encoder de indexación: un proceso o un pool de N procesos con su propia copia del modelo.
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+
+from model_backend import EMBED_BACKEND, load_sentence_model, model_id
+
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+# Lotes por presupuesto de tokens con relleno (nº textos * longitud máxima del lote)
+EMBED_TOKEN_BUDGET = int(os.getenv("EMBED_TOKEN_BUDGET", "16384"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "128"))
+# Multi-proceso: trozos mínimos por worker para que el pool reparta la carga dinámicamente
+EMBED_CHUNKS_PER_WORKER = int(os.getenv("EMBED_CHUNKS_PER_WORKER", "4"))
+
+
+def token_budget_batches(lengths: List[int], budget: int, max_batch: int) -> List[List[int]]:
+    """Agrupa índices ordenados por longitud de forma que len(lote) * max(long) <= budget."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, cur, cur_max = [], [], 0
+    for i in order:
+        new_max = max(cur_max, lengths[i])
+        if cur and (len(cur) + 1 > max_batch or (len(cur) + 1) * new_max > budget):
+            batches.append(cur)
+            cur, new_max = [], lengths[i]
+        cur.append(i)
+        cur_max = new_max
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+# --- Procesos del pool: cada uno carga su copia del modelo con su parte de los núcleos ---
+_worker_model = None
+
+
+def _init_worker(model_name: str, backend: str, threads: int) -> None:
+    global _worker_model
+    # Solo en el worker y sobrescribiendo: el proceso principal conserva todos sus hilos
+    os.environ["OMP_NUM_THREADS"] = os.environ["MKL_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model, _ = load_sentence_model(model_name, backend, fallback=False)
+
+
+def _encode_chunk(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size, normalize_embeddings=True), dtype=np.float32)
+
+
+class Encoder:
+    """encode(texts) -> matriz float32 normalizada, en el mismo orden que `texts`.
+
+    Con workers > 1 reparte los textos entre procesos (ProcessPoolExecutor con spawn; cada
+    worker usa cpu_count // workers hilos); si el pool no se puede arrancar se vuelve a un
+    solo proceso. Los textos se agrupan por longitud en
+    tokens para no rellenar títulos cortos hasta la longitud de un text_raw de 8 KB.
+    """
+
+    def __init__(self, model_name: str, workers: int = EMBED_WORKERS, batch_size: int = 32,
+                 token_budget: int = EMBED_TOKEN_BUDGET, max_batch: int = EMBED_MAX_BATCH,
+                 backend: str = EMBED_BACKEND):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.workers = 1
+        self._pool = None
+        self.model, self.backend = load_sentence_model(model_name, backend)
+        # Identificador para almacén/manifiesto: modelo + backend efectivo
+        self.model_id = model_id(model_name, self.backend)
+        if workers > 1:
+            # Cada worker usa su parte de los núcleos (evita sobre-suscribir hilos de torch)
+            threads = max(1, (os.cpu_count() or workers) // workers)
+            try:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker, initargs=(model_name, self.backend, threads))
+                self._pool.submit(_encode_chunk, ["warm-up"], 1).result()
+                self.workers = workers
+                print(f"🧵 Pool de encoding con {workers} procesos ({threads} hilos cada uno)")
+            except Exception as e:
+                print(f"⚠️ No se pudo arrancar el pool de {workers} procesos ({e}); se usa 1 proceso")
+                if self._pool is not None:
+                    self._pool.shutdown(cancel_futures=True)
+                    self._pool = None
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        max_len = getattr(self.model, "max_seq_length", None) or 512
+        try:
+            enc = self.model.tokenizer(list(texts), add_special_tokens=True, truncation=True,
+                                       max_length=max_len, return_length=True)
+            return [int(n) for n in enc["length"]]
+        except Exception:
+            # Aproximación si el tokenizer no devuelve longitudes
+            return [min(max_len, int(len(t.split()) * 1.5) + 2) for t in texts]
+
+    def padding_efficiency(self) -> float:
+        return self.real_tokens / self.padded_tokens if self.padded_tokens else 1.0
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        dim = self.model.get_sentence_embedding_dimension()
+        if not texts:
+            return np.zeros((0, dim), dtype=np.float32)
+        lengths = self.token_lengths(texts)
+        # Lotes pequeños: el coste de IPC supera al de codificar en el proceso principal
+        if self._pool is None or len(texts) < 2 * self.workers:
+            out = np.empty((len(texts), dim), dtype=np.float32)
+            for idx in token_budget_batches(lengths, self.token_budget, self.max_batch):
+                batch = [texts[i] for i in idx]
+                out[idx] = self.model.encode(batch, batch_size=len(batch), normalize_embeddings=True)
+                self.real_tokens += sum(lengths[i] for i in idx)
+                self.padded_tokens += len(idx) * max(lengths[i] for i in idx)
+            return out
+        # Multi-proceso: muchos lotes homogéneos por presupuesto de tokens (varios por worker),
+        # los más caros primero; cada worker toma el siguiente al terminar el anterior
+        max_batch = min(self.max_batch, max(1, math.ceil(len(texts) / (EMBED_CHUNKS_PER_WORKER * self.workers))))
+        parts = token_budget_batches(lengths, self.token_budget, max_batch)
+        parts.sort(key=lambda idx: len(idx) * max(lengths[i] for i in idx), reverse=True)
+        futures = [self._pool.submit(_encode_chunk, [texts[i] for i in idx], len(idx)) for idx in parts]
+        out = np.empty((len(texts), dim), dtype=np.float32)
+        for idx, fut in zip(parts, futures):
+            out[idx] = _normalize(fut.result())
+            self.real_tokens += sum(lengths[i] for i in idx)
+            self.padded_tokens += len(idx) * max(lengths[i] for i in idx)
+        return out
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "Encoder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
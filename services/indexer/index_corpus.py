@@ -1,41 +1,72 @@
-import json, requests, os, time
+import requests, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
 from pathlib import Path
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
+from corpus_store import get_corpus_store
+from index_generation import bump_generation
+from manifest import content_hash, load_manifest, plan_summary, removed_ids, save_manifest
+
 # === Config por entorno (con valores por defecto) ===
 BASE_DIR = Path(os.getenv("CORPUS_DIR", "/app/data/corpus"))
 CORPUS_PATH = Path(os.getenv("CORPUS_PATH", str(BASE_DIR / "books_preprocessed_MWE.jsonl")))
 SOLR_BASE = os.getenv("SOLR_BASE", "http://solr:8983/solr/rag_core")
-SOLR_UPDATE = f"{SOLR_BASE}/update?commit=true"
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "50"))
 RETRIES = int(os.getenv("SOLR_RETRIES", "20"))
 SLEEP_S = float(os.getenv("SOLR_SLEEP", "1.5"))
+WORKERS = max(1, int(os.getenv("SOLR_WORKERS", "4")))
+# commitWithin (ms) por lote; 0 = sin commits intermedios, un único commit al final
+COMMIT_WITHIN_MS = int(os.getenv("COMMIT_WITHIN_MS", "0"))
+
+SOLR_UPDATE = f"{SOLR_BASE}/update"
+UPDATE_PARAMS = {"commitWithin": COMMIT_WITHIN_MS} if COMMIT_WITHIN_MS > 0 else {}
 
 print("🚀 Iniciando indexación del corpus en Solr...")
 if not CORPUS_PATH.exists():
     raise FileNotFoundError(f"No se encontró el corpus en {CORPUS_PATH}")
 
-# === Cargar documentos ===
-with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-    docs = [json.loads(line) for line in f]
 
-# === Transformar formato para Solr ===
-solr_docs = []
-for d in docs:
-    solr_docs.append({
-        "id": d["section_id"],
-        "section_title": d.get("section_title", ""),
-        "text_raw": d.get("text_raw", ""),
-        "lemmas": " ".join(d.get("lemmas", []))
-    })
+# === Lectura en streaming (memoria acotada a WORKERS * 2 lotes) ===
+def iter_solr_docs(path: Path):
+    for d in get_corpus_store(path).iter_docs():
+        yield {
+            "id": d["section_id"],
+            "section_title": d.get("section_title", ""),
+            "text_raw": d.get("text_raw", ""),
+            "lemmas": " ".join(d.get("lemmas", []))
+        }
+
+
+def iter_changed(docs, old: dict, seen: dict):
+    """Solo emite documentos nuevos o con hash distinto; registra todos los hashes en `seen`."""
+    for doc in docs:
+        h = content_hash(doc["id"], doc["section_title"], doc["text_raw"], doc["lemmas"])
+        seen[doc["id"]] = h
+        if old.get(doc["id"]) != h:
+            yield doc, h
+
+
+def iter_batches(it, size: int):
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
 
-print(f"📄 Documentos a indexar: {len(solr_docs)}")
+
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=WORKERS))
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=WORKERS))
 
 # === Ping simple a Solr con reintentos (por si el core tarda) ===
+num_found = 0
 for attempt in range(1, RETRIES + 1):
     try:
-        r = requests.get(f"{SOLR_BASE}/select?q=*:*&rows=0", timeout=3)
+        r = session.get(f"{SOLR_BASE}/select?q=*:*&rows=0&wt=json", timeout=3)
         if r.ok:
+            num_found = r.json().get("response", {}).get("numFound", 0)
             break
     except RequestException:
         pass
@@ -44,16 +75,92 @@ for attempt in range(1, RETRIES + 1):
 else:
     raise RuntimeError("Solr no respondió a tiempo. Revisa el core/servicio.")
 
-# === Enviar en lotes ===
-for i in range(0, len(solr_docs), BATCH_SIZE):
-    batch = solr_docs[i:i + BATCH_SIZE]
+
+def send_batch(n: int, batch: list) -> list:
+    """Devuelve los (id, hash) indexados con éxito para actualizar el manifiesto."""
     try:
-        resp = requests.post(SOLR_UPDATE, json=batch, timeout=10)
+        resp = session.post(SOLR_UPDATE, params=UPDATE_PARAMS, json=[d for d, _ in batch], timeout=30)
         if resp.status_code != 200:
-            print(f"⚠️ Error en lote {i//BATCH_SIZE}: {resp.status_code} {resp.text[:300]}")
-        else:
-            print(f"✅ Lote {i//BATCH_SIZE + 1} indexado ({len(batch)} docs)")
+            print(f"⚠️ Error en lote {n}: {resp.status_code} {resp.text[:300]}")
+            return []
+        print(f"✅ Lote {n} indexado ({len(batch)} docs)")
+        return [(d["id"], h) for d, h in batch]
     except RequestException as e:
-        print(f"⚠️ Error de conexión en lote {i//BATCH_SIZE}: {e}")
+        print(f"⚠️ Error de conexión en lote {n}: {e}")
+        return []
+
+
+# === Plan incremental: si el core está vacío el manifiesto previo no vale ===
+old_manifest = load_manifest("solr") if num_found > 0 else {}
+seen = {}
+manifest = dict(old_manifest)
+
+# === Enviar en lotes con WORKERS envíos concurrentes ===
+t0 = time.time()
+indexed = 0
+failed_batches = failed_docs = 0
+delete_failed = False
+
+
+def collect(fut, size: int):
+    """Los lotes fallidos no entran en el manifiesto: se reintentan en la próxima ejecución."""
+    global indexed, failed_batches, failed_docs
+    ok = fut.result()
+    manifest.update(ok)
+    indexed += len(ok)
+    if not ok:
+        failed_batches += 1
+        failed_docs += size
+
+
+with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+    pending = {}
+    changed = iter_changed(iter_solr_docs(CORPUS_PATH), old_manifest, seen)
+    for n, batch in enumerate(iter_batches(changed, BATCH_SIZE), 1):
+        # Backpressure: no leer más corpus del que los workers pueden enviar
+        if len(pending) >= WORKERS * 2:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                collect(f, pending.pop(f))
+        pending[pool.submit(send_batch, n, batch)] = len(batch)
+    for f, size in pending.items():
+        collect(f, size)
+
+# === Borrar secciones que ya no están en el corpus ===
+gone = removed_ids(old_manifest, seen)
+if gone:
+    try:
+        resp = session.post(SOLR_UPDATE, json={"delete": sorted(gone)}, timeout=60)
+        resp.raise_for_status()
+        for sid in gone:
+            manifest.pop(sid, None)
+        print(f"🗑️ Eliminados {len(gone)} documentos obsoletos")
+    except RequestException as e:
+        delete_failed = True
+        print(f"⚠️ Error eliminando documentos obsoletos: {e}")
+
+added, changed_n, same, removed = plan_summary(old_manifest, seen)
+print(f"📄 Documentos leídos: {len(seen)} | nuevos: {added} | cambiados: {changed_n} | sin cambios: {same} | eliminados: {removed}")
+
+if indexed or gone:
+    # === Commit final único ===
+    try:
+        resp = session.get(SOLR_UPDATE, params={"commit": "true"}, timeout=120)
+        resp.raise_for_status()
+    except RequestException as e:
+        raise RuntimeError(f"Commit final de Solr falló: {e}")
+    save_manifest("solr", manifest)
+    bump_generation("solr")
+else:
+    save_manifest("solr", manifest)
+    if not failed_batches and not delete_failed:
+        print("ℹ️ Sin cambios respecto al manifiesto; no se hace commit.")
 
+elapsed = time.time() - t0
+print(f"⏱️ {elapsed:.1f}s ({indexed / elapsed if elapsed > 0 else 0:.0f} docs/s, {WORKERS} workers)")
+if failed_batches or delete_failed:
+    print(f"❌ Indexación incompleta: {failed_batches} lotes fallidos ({failed_docs} docs)"
+          + ("; borrado de obsoletos fallido" if delete_failed else "")
+          + f"; {indexed} docs indexados. Se reintentarán en la próxima ejecución.")
+    sys.exit(1)
 print("🎯 Indexación completada.")
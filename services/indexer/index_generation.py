@@ -0,0 +1,30 @@
+# services/indexer/index_generation.py
+# Contador de generación del índice, compartido con la API a través de /app/data.
+import json
+import os
+import time
+from pathlib import Path
+
+INDEX_GEN_PATH = Path(os.getenv("INDEX_GEN_PATH", "/app/data/index_generation.json"))
+
+
+def read_generation(path: Path = INDEX_GEN_PATH) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def bump_generation(backend: str, path: Path = INDEX_GEN_PATH) -> int:
+    """Incrementa la generación de `backend` ("solr" | "milvus") con escritura atómica."""
+    gen = read_generation(path)
+    gen[backend] = int(gen.get(backend, 0)) + 1
+    gen["updated_at"] = time.time()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(gen, f)
+    os.replace(tmp, path)
+    print(f"🔢 Generación de índice {backend} = {gen[backend]}")
+    return gen[backend]
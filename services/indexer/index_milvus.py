@@ -1,20 +1,30 @@
 # services/indexer/index_milvus.py
-import os, json
+import os, json, queue, sys, threading, time
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 from pymilvus import (
     connections, utility, FieldSchema, CollectionSchema,
     DataType, Collection
 )
 
+from corpus_store import get_corpus_store
+from embedding_store import EmbeddingStore, text_hash
+from encoder import EMBED_WORKERS, Encoder
+from index_generation import bump_generation
+from manifest import content_hash, load_manifest, plan_summary, removed_ids, save_manifest
+
 # --- Config ---
 MILVUS_HOST = os.getenv("MILVUS_HOST", "milvus")
 MILVUS_PORT = os.getenv("MILVUS_PORT", "19530")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "rag_corpus")
-CORPUS_PATH = Path("/app/data/corpus/books_preprocessed_MWE.jsonl")
+CORPUS_PATH = Path(os.getenv("CORPUS_PATH", "/app/data/corpus/books_preprocessed_MWE.jsonl"))
 MODEL_NAME = os.getenv("MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
 DIM = 384  # all-MiniLM-L6-v2
 
+# Pipeline parse -> embed -> insert (tamaños de lote por etapa y profundidad de colas)
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "128"))
+INSERT_BATCH = int(os.getenv("INSERT_BATCH", "256"))
+QUEUE_DEPTH = int(os.getenv("PIPELINE_QUEUE_DEPTH", "4"))
+
 # Límites del esquema (coherentes con Milvus VARCHAR)
 MAX_ID = 128
 MAX_TITLE = 512
@@ -30,35 +40,6 @@ def clip(s: str, max_len: int) -> str:
         return s[:max_len]
     return s
 
-print("🚀 Conectando a Milvus...")
-connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
-
-# 1) Crear colección si no existe
-if not utility.has_collection(COLLECTION_NAME):
-    print(f"📦 Creando colección {COLLECTION_NAME}...")
-    fields = [
-        FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, max_length=MAX_ID),
-        FieldSchema(name="section_title", dtype=DataType.VARCHAR, max_length=MAX_TITLE),
-        FieldSchema(name="text_raw", dtype=DataType.VARCHAR, max_length=MAX_TEXT),
-        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=DIM),
-    ]
-    schema = CollectionSchema(fields, description="RAG corpus (MiniLM-L6)")
-    coll = Collection(name=COLLECTION_NAME, schema=schema)
-else:
-    print(f"✅ Colección existente: {COLLECTION_NAME}")
-    coll = Collection(COLLECTION_NAME)
-
-# Crear índice si no existe aún (AUTOINDEX + COSINE)
-if not coll.indexes:
-    print("🔧 Creando índice AUTOINDEX/COSINE…")
-    coll.create_index(
-        field_name="embedding",
-        index_params={"index_type": "AUTOINDEX", "metric_type": "COSINE", "params": {}},
-    )
-
-# 2) Cargar corpus
-if not CORPUS_PATH.exists():
-    raise FileNotFoundError(f"No se encontró el corpus en {CORPUS_PATH}")
 def utf8_truncate(s: str, max_bytes: int) -> str:
     if s is None:
         return ""
@@ -67,52 +48,274 @@ def utf8_truncate(s: str, max_bytes: int) -> str:
         return s
     return b[:max_bytes].decode("utf-8", errors="ignore")
 
-docs = []
-with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-    for line in f:
-        d = json.loads(line)
-        docs.append({
-            "id": (d["section_id"] or "")[:128],
-            "section_title": utf8_truncate(d.get("section_title") or "", 512),   # 512 bytes
-            "text_raw": utf8_truncate(d.get("text_raw") or "", 8192),            # 8192 bytes
-        })
 
-print(f"📄 Documentos a indexar en Milvus: {len(docs)}")
+def embed_text(doc: dict) -> str:
+    # Para embeddings: si text_raw está vacío, caemos al título
+    return doc["text_raw"] if doc["text_raw"] else doc["section_title"]
 
-# 3) Embeddings + insert por lotes
-model = SentenceTransformer(MODEL_NAME)
-BATCH = 128
 
-# (Opcional) cargar colección antes de operaciones intensivas
-coll.load()
+def open_collection() -> Collection:
+    print("🚀 Conectando a Milvus...")
+    connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
 
-for i in range(0, len(docs), BATCH):
-    batch = docs[i:i+BATCH]
-    # Para embeddings: si text_raw está vacío, caemos al título
-    texts = [b["text_raw"] if b["text_raw"] else b["section_title"] for b in batch]
-    embs = model.encode(texts, normalize_embeddings=True).tolist()
-
-    entities = [
-        [b["id"] for b in batch],
-        [b["section_title"] for b in batch],
-        [b["text_raw"] for b in batch],
-        embs,
-    ]
+    # 1) Crear colección si no existe
+    if not utility.has_collection(COLLECTION_NAME):
+        print(f"📦 Creando colección {COLLECTION_NAME}...")
+        fields = [
+            FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, max_length=MAX_ID),
+            FieldSchema(name="section_title", dtype=DataType.VARCHAR, max_length=MAX_TITLE),
+            FieldSchema(name="text_raw", dtype=DataType.VARCHAR, max_length=MAX_TEXT),
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=DIM),
+        ]
+        schema = CollectionSchema(fields, description="RAG corpus (MiniLM-L6)")
+        coll = Collection(name=COLLECTION_NAME, schema=schema)
+    else:
+        print(f"✅ Colección existente: {COLLECTION_NAME}")
+        coll = Collection(COLLECTION_NAME)
+
+    # Crear índice si no existe aún (AUTOINDEX + COSINE)
+    if not coll.indexes:
+        print("🔧 Creando índice AUTOINDEX/COSINE…")
+        coll.create_index(
+            field_name="embedding",
+            index_params={"index_type": "AUTOINDEX", "metric_type": "COSINE", "params": {}},
+        )
+    return coll
+
+
+# === Pipeline con colas acotadas: parse (hilo) -> embed (principal) -> insert (hilo) -> fallback (hilo) ===
+STOP = object()
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy_s = 0.0
+
+    def report(self, wall_s: float) -> str:
+        busy = self.items / self.busy_s if self.busy_s > 0 else 0.0
+        wall = self.items / wall_s if wall_s > 0 else 0.0
+        return f"{self.name:<8} {self.items:>7} docs en {self.batches:>4} lotes | ocupado {self.busy_s:6.1f}s ({busy:7.0f} docs/s) | global {wall:7.0f} docs/s"
+
+
+def run_pipeline(coll: Collection, store: EmbeddingStore, encoder: Encoder, old_manifest: dict):
+    """Devuelve (manifest, seen, sections, stats, wall_s)."""
+    manifest = dict(old_manifest)
+    seen = {}
+    sections = {}  # section_id -> hash del texto embebido (para el almacén de embeddings)
+    stats = {n: StageStats(n) for n in ("parse", "embed", "insert", "fallback")}
+    failed = threading.Event()
+    errors = []
+
+    def put(q: queue.Queue, item) -> None:
+        # put bloqueante que se rinde si otra etapa ha fallado (evita interbloqueos)
+        while not failed.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+        raise RuntimeError("pipeline abortado")
+
+    def get(q: queue.Queue):
+        # get bloqueante; si otra etapa falló se comporta como fin de flujo
+        while True:
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                if failed.is_set():
+                    return STOP
+
+    def stage(fn):
+        def run(*args):
+            try:
+                fn(*args)
+            except Exception as e:
+                if not failed.is_set():
+                    errors.append(e)
+                    failed.set()
+        return run
 
-    try:
-        coll.insert(entities)
-        print(f"✅ Inserción Milvus lote {i//BATCH+1} ({len(batch)} docs)")
-    except Exception as e:
-        # Si algún registro viola el esquema, log útil para depuración
-        print(f"❌ Error en lote {i//BATCH+1}: {e}")
-        # Opcional: intentar inserción doc a doc para identificar el problemático
-        for j, one in enumerate(zip(*entities)):
+    @stage
+    def parse_stage(out_q: queue.Queue) -> None:
+        st = stats["parse"]
+        batch = []
+        t = time.perf_counter()
+        for d in get_corpus_store(CORPUS_PATH).iter_docs():
+            doc = {
+                "id": (d["section_id"] or "")[:128],
+                "section_title": utf8_truncate(d.get("section_title") or "", 512),   # 512 bytes
+                "text_raw": utf8_truncate(d.get("text_raw") or "", 8192),            # 8192 bytes
+            }
+            # Modelo y backend entran en el hash: cambiarlos obliga a re-embeber todo
+            h = content_hash(doc["id"], doc["section_title"], doc["text_raw"], encoder.model_id)
+            seen[doc["id"]] = h
+            sections[doc["id"]] = text_hash(embed_text(doc))
+            if old_manifest.get(doc["id"]) == h:
+                continue
+            doc["hash"] = h
+            batch.append(doc)
+            if len(batch) >= EMBED_BATCH:
+                st.busy_s += time.perf_counter() - t
+                st.items += len(batch); st.batches += 1
+                put(out_q, batch)
+                batch = []
+                t = time.perf_counter()
+        st.busy_s += time.perf_counter() - t
+        if batch:
+            st.items += len(batch); st.batches += 1
+            put(out_q, batch)
+        put(out_q, STOP)
+
+    def upsert(batch) -> None:
+        coll.upsert([
+            [b["id"] for b in batch],
+            [b["section_title"] for b in batch],
+            [b["text_raw"] for b in batch],
+            [b["embedding"] for b in batch],
+        ])
+
+    @stage
+    def embed_stage(in_q: queue.Queue, out_q: queue.Queue) -> None:
+        st = stats["embed"]
+        while True:
+            batch = get(in_q)
+            if batch is STOP:
+                break
+            t = time.perf_counter()
+            embs = store.encode_cached([embed_text(b) for b in batch], encoder.encode)
+            store.flush()
+            for b, e in zip(batch, embs):
+                b["embedding"] = e.tolist()
+            st.busy_s += time.perf_counter() - t
+            st.items += len(batch); st.batches += 1
+            put(out_q, batch)
+        put(out_q, STOP)
+
+    @stage
+    def insert_stage(in_q: queue.Queue, fallback_q: queue.Queue) -> None:
+        st = stats["insert"]
+        pending = []
+
+        def flush():
+            t = time.perf_counter()
+            # upsert: las secciones cambiadas reemplazan su vector sin duplicar la clave primaria
             try:
-                coll.insert([[one[0]], [one[1]], [one[2]], [one[3]]])
-            except Exception as e1:
-                print(f"   ↳ Falló doc #{j} del lote (id={one[0]}): {e1}")
-
-# Sincroniza segmentos a disco
-coll.flush()
-coll.release()
-print("🎯 Indexación Milvus completada.")
+                upsert(pending)
+                manifest.update((b["id"], b["hash"]) for b in pending)
+                print(f"✅ Inserción Milvus lote {st.batches + 1} ({len(pending)} docs)")
+            except Exception as e:
+                # Si algún registro viola el esquema, se reintenta doc a doc fuera del camino crítico
+                print(f"❌ Error en lote {st.batches + 1}: {e}")
+                put(fallback_q, list(pending))
+            st.busy_s += time.perf_counter() - t
+            st.items += len(pending); st.batches += 1
+            pending.clear()
+
+        while True:
+            item = get(in_q)
+            if item is STOP:
+                break
+            pending.extend(item)
+            if len(pending) >= INSERT_BATCH:
+                flush()
+        if pending:
+            flush()
+        put(fallback_q, STOP)
+
+    @stage
+    def fallback_stage(in_q: queue.Queue) -> None:
+        st = stats["fallback"]
+        while True:
+            batch = get(in_q)
+            if batch is STOP:
+                return
+            t = time.perf_counter()
+            for j, b in enumerate(batch):
+                try:
+                    upsert([b])
+                    manifest[b["id"]] = b["hash"]
+                except Exception as e1:
+                    print(f"   ↳ Falló doc #{j} del lote (id={b['id']}): {e1}")
+            st.busy_s += time.perf_counter() - t
+            st.items += len(batch); st.batches += 1
+
+    parse_q = queue.Queue(maxsize=QUEUE_DEPTH)
+    insert_q = queue.Queue(maxsize=QUEUE_DEPTH)
+    fallback_q = queue.Queue()
+    threads = [
+        threading.Thread(target=parse_stage, args=(parse_q,), name="parse", daemon=True),
+        threading.Thread(target=insert_stage, args=(insert_q, fallback_q), name="insert", daemon=True),
+        threading.Thread(target=fallback_stage, args=(fallback_q,), name="fallback", daemon=True),
+    ]
+    t0 = time.perf_counter()
+    for th in threads:
+        th.start()
+    embed_stage(parse_q, insert_q)
+    for th in threads:
+        th.join()
+    if errors:
+        raise errors[0]
+    return manifest, seen, sections, stats, time.perf_counter() - t0
+
+
+def main() -> None:
+    coll = open_collection()
+
+    # 2) Cargar corpus
+    if not CORPUS_PATH.exists():
+        raise FileNotFoundError(f"No se encontró el corpus en {CORPUS_PATH}")
+
+    # Plan incremental: con la colección vacía el manifiesto previo no vale
+    old_manifest = load_manifest("milvus") if coll.num_entities > 0 else {}
+
+    # (Opcional) cargar colección antes de operaciones intensivas
+    coll.load()
+
+    # 3) Embeddings + insert por lotes
+    with Encoder(MODEL_NAME, EMBED_WORKERS) as encoder:
+        # Los vectores ya calculados (mismo texto, modelo y backend) salen del almacén en disco
+        store = EmbeddingStore(encoder.model_id, DIM)
+        manifest, seen, sections, stats, wall = run_pipeline(coll, store, encoder, old_manifest)
+
+    store.flush()
+    store.save_sections(sections)
+    print(f"💾 Almacén de embeddings: {store.stats()}")
+
+    added, changed, same, removed = plan_summary(old_manifest, seen)
+    print(f"📄 Secciones en corpus: {len(seen)} | nuevas: {added} | cambiadas: {changed} | sin cambios: {same} | eliminadas: {removed}")
+    print(f"⏱️ Pipeline: {wall:.1f}s ({encoder.workers} proceso(s) de encoding, backend {encoder.backend}, "
+          f"eficiencia de padding {encoder.padding_efficiency():.0%})")
+    for st in stats.values():
+        print("   " + st.report(wall))
+
+    # Eliminar secciones que ya no están en el corpus
+    gone = removed_ids(old_manifest, seen)
+    if gone:
+        ids = ", ".join(json.dumps(sid) for sid in sorted(gone))
+        coll.delete(expr=f"id in [{ids}]")
+        for sid in gone:
+            manifest.pop(sid, None)
+        print(f"🗑️ Eliminadas {len(gone)} secciones obsoletas")
+
+    # Sincroniza segmentos a disco
+    coll.flush()
+    coll.release()
+    save_manifest("milvus", manifest)
+    # El manifiesto solo se actualiza tras un upsert correcto: lo que difiere del anterior se escribió
+    written = sum(1 for sid, h in manifest.items() if old_manifest.get(sid) != h)
+    failed = stats["parse"].items - written
+    if written or gone:
+        bump_generation("milvus")
+    if failed:
+        print(f"❌ Indexación Milvus incompleta: {failed} secciones sin insertar ({written} insertadas). "
+              f"Se reintentarán en la próxima ejecución.")
+        sys.exit(1)
+    print("🎯 Indexación Milvus completada.")
+
+
+# Guardia obligatoria: los workers del pool de encoding (spawn) reimportan este módulo
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# services/indexer/manifest.py
+# Manifiesto section_id -> hash de contenido para reindexado incremental.
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Set, Tuple
+
+MANIFEST_DIR = Path(os.getenv("MANIFEST_DIR", "/app/data"))
+FULL_REINDEX = os.getenv("FULL_REINDEX", "0") == "1"
+
+
+def manifest_path(backend: str) -> Path:
+    return MANIFEST_DIR / f"index_manifest_{backend}.json"
+
+
+def content_hash(*parts) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        if isinstance(p, (list, tuple)):
+            p = " ".join(map(str, p))
+        h.update(str(p if p is not None else "").encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def load_manifest(backend: str) -> Dict[str, str]:
+    """Manifiesto previo; vacío si no existe o si FULL_REINDEX=1."""
+    if FULL_REINDEX:
+        return {}
+    try:
+        with open(manifest_path(backend), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(backend: str, manifest: Dict[str, str]) -> None:
+    path = manifest_path(backend)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def removed_ids(old: Dict[str, str], seen: Iterable[str]) -> Set[str]:
+    return set(old) - set(seen)
+
+
+def plan_summary(old: Dict[str, str], new: Dict[str, str]) -> Tuple[int, int, int, int]:
+    """(nuevos, cambiados, sin cambios, eliminados)."""
+    added = sum(1 for k in new if k not in old)
+    changed = sum(1 for k, h in new.items() if k in old and old[k] != h)
+    same = len(new) - added - changed
+    return added, changed, same, len(set(old) - set(new))